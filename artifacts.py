@@ -0,0 +1,93 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from disk_cache import source_key, temp_path
+
+"""
+Prebuilt, memory-mappable data files for the Dash apps.
+
+`build_artifacts.py` writes the cleaned/aggregated tables each app needs as
+uncompressed Arrow IPC (Feather v2) files. The apps map them read-only at
+startup instead of parsing the raw CSVs, so every gunicorn worker starts
+fast and reads the same pages from the OS page cache instead of holding its
+own freshly parsed copy.
+
+Each file records the keys (path, size, mtime) of the sources it was built
+from in its schema metadata; a missing or stale artifact makes the app fall
+back to building the data itself.
+"""
+
+ARTIFACT_DIR = "data/artifacts"
+
+
+def artifact_path(name, artifact_dir=ARTIFACT_DIR):
+    return os.path.join(artifact_dir, name + ".arrow")
+
+
+def _sources_key(sources):
+    return [source_key(p) for p in sorted(sources)]
+
+
+def write_artifact(name, df, sources, artifact_dir=ARTIFACT_DIR):
+    """Write df as an uncompressed Arrow IPC file keyed on the source files it was built from."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"sources"] = json.dumps(_sources_key(sources)).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = artifact_path(name, artifact_dir)
+    os.makedirs(artifact_dir, exist_ok=True)
+    # uncompressed so the file can be mapped as-is; written through a temp
+    # file of its own so running workers never map a half-written artifact
+    # and concurrent builds never write into the same one
+    tmp = temp_path(path)
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def _arrow_text(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def _mapped_categorical(column):
+    """
+    Categorical whose codes are a view of a dictionary column's indices, or
+    None when they can't be (nulls need -1 codes, several chunks need a concat).
+    """
+    if not pa.types.is_dictionary(column.type) or column.num_chunks != 1 or column.null_count:
+        return None
+    chunk = column.chunk(0)
+    return pd.Categorical.from_codes(chunk.indices.to_numpy(zero_copy_only=True),
+                                     categories=chunk.dictionary.to_pandas(), ordered=column.type.ordered)
+
+
+def map_artifact(name, sources, artifact_dir=ARTIFACT_DIR):
+    """DataFrame over the memory-mapped artifact, or None if it is missing or stale."""
+    try:
+        table = feather.read_table(artifact_path(name, artifact_dir), memory_map=True)
+        built_from = json.loads(table.schema.metadata[b"sources"])
+        if built_from != _sources_key(sources):
+            return None
+    except (OSError, KeyError, TypeError, ValueError):
+        return None
+    # split_blocks keeps pandas from consolidating (copying) the columns, so
+    # numeric columns without nulls stay views of the mapped file. Categorical
+    # columns without nulls keep their codes in the file too (only the
+    # categories are copied); text columns stay Arrow-backed.
+    shared = {c: cat for c in table.column_names if (cat := _mapped_categorical(table[c])) is not None}
+    df = table.drop_columns(list(shared)).to_pandas(split_blocks=True, types_mapper=_arrow_text)
+    for i, c in enumerate(table.column_names):
+        if c in shared:
+            df.insert(i, c, pd.Series(shared[c], copy=False))
+    return df
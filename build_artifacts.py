@@ -0,0 +1,38 @@
+import sys
+import time
+
+from artifacts import ARTIFACT_DIR, write_artifact
+from preprocess import load_us_sales, preprocess_recall_data, recall_files, recall_year_counts
+
+"""
+Build step for the Dash apps: prebuilds the data viz3 and viz6_discarded
+load at startup into data/artifacts/ (see artifacts.py).
+
+Run it after the raw data changes, before starting the app workers:
+    python build_artifacts.py          # everything
+    python build_artifacts.py viz3     # just one app
+"""
+
+RECALL_PATH = "data/recall"
+US_SALES_PATH = "data/cars23_US.csv"
+
+
+def build_viz3(recall_path=RECALL_PATH):
+    df = preprocess_recall_data(recall_path)
+    sources = recall_files(recall_path)
+    return [write_artifact("recall_" + name, table, sources)
+            for name, table in recall_year_counts(df).items()]
+
+
+def build_viz6(csv_path=US_SALES_PATH):
+    return [write_artifact("us_sales", load_us_sales(csv_path), [csv_path])]
+
+
+BUILDERS = {"viz3": build_viz3, "viz6": build_viz6}
+
+if __name__ == "__main__":
+    for app in sys.argv[1:] or BUILDERS:
+        start = time.perf_counter()
+        paths = BUILDERS[app]()
+        print(f"{app}: wrote {', '.join(paths)} in {time.perf_counter() - start:.1f}s")
+    print(f"Artifacts are in {ARTIFACT_DIR}/")
@@ -0,0 +1,88 @@
+import json
+import os
+import uuid
+
+import pandas as pd
+
+"""
+Small on-disk cache for cleaned DataFrames.
+
+Each cached frame is a Parquet file with a JSON sidecar holding the key of
+the source it was built from (path, size, mtime). A cache entry is only used
+while that key still matches, so editing or replacing a source file
+invalidates it automatically.
+"""
+
+CACHE_DIR = "data/cache"
+
+
+def source_key(path):
+    """Identify a source file by path, size and modification time."""
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def read_cached(cache_path, key):
+    """Return (df, meta) if cache_path was written for `key`, else None."""
+    try:
+        with open(cache_path + ".json") as f:
+            entry = json.load(f)
+        if entry["key"] != key:
+            return None
+        return pd.read_parquet(cache_path), entry.get("meta", {})
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def temp_path(path, suffix=".tmp"):
+    """
+    A fresh, empty temp file next to `path`, so concurrent writers never
+    share one. Created with open(..., "x") rather than tempfile.mkstemp so it
+    gets the usual umask permissions, which os.replace carries over to `path`.
+    """
+    tmp = f"{path}.{uuid.uuid4().hex}{suffix}"
+    open(tmp, "x").close()
+    return tmp
+
+
+def write_cached(cache_path, df, key, meta=None):
+    """Store df under cache_path together with the key it was built from."""
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    # drop the old key first and write through temp files, so a crash never
+    # pairs a stale key with new data
+    try:
+        os.remove(cache_path + ".json")
+    except FileNotFoundError:
+        pass
+    data_tmp = temp_path(cache_path)
+    key_tmp = temp_path(cache_path, ".json.tmp")
+    try:
+        df.to_parquet(data_tmp)
+        with open(key_tmp, "w") as f:
+            json.dump({"key": key, "meta": meta or {}}, f)
+        os.replace(data_tmp, cache_path)
+        os.replace(key_tmp, cache_path + ".json")
+    finally:
+        for tmp in (data_tmp, key_tmp):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def cached(source_path, cache_path, build, version=0, meta=False):
+    """
+    build(source_path), reused from cache_path while the source file is
+    unchanged. Bump `version` whenever build's output changes, so cache files
+    written by older code are rebuilt. With meta=True, build returns
+    (df, meta dict) and so does this function; the meta is cached alongside.
+    A falsy cache_path just builds.
+    """
+    if not cache_path:
+        return build(source_path)
+    key = dict(source_key(source_path), version=version)
+    hit = read_cached(cache_path, key)
+    if hit is not None:
+        return hit if meta else hit[0]
+    result = build(source_path)
+    df, extra = result if meta else (result, None)
+    write_cached(cache_path, df, key, extra)
+    return result
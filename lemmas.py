@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+from disk_cache import CACHE_DIR, read_cached, write_cached
+
+"""
+Lemmatized recall summaries for the wordcloud (viz4 --lemmas), so that
+"fire", "fires" and "fired" are counted as one term.
+
+spaCy only runs the components the lemmatizer needs (the parser and NER are
+not loaded) and processes the summaries in batches with nlp.pipe, across
+several processes for large inputs. The lemmas of every campaign are kept in
+a Parquet cache, so a re-run only lemmatizes campaigns it has not seen
+before. spaCy is only imported when this mode is used.
+"""
+
+LEMMA_MODEL = "en_core_web_sm"
+LEMMA_CACHE_PATH = os.path.join(CACHE_DIR, "recall_lemmas.parquet")
+# not needed for lemmas (the rule lemmatizer only uses the tagger and attribute_ruler)
+LEMMA_EXCLUDE = ["parser", "ner"]
+# summaries are a paragraph each; `python lemmas.py` compares other batch sizes
+LEMMA_BATCH_SIZE = 256
+LEMMA_COLUMNS = ["NHTSA ID", "SUMMARY", "LEMMAS"]
+
+
+def load_lemmatizer(model=LEMMA_MODEL):
+    import spacy
+
+    try:
+        return spacy.load(model, exclude=LEMMA_EXCLUDE)
+    except OSError as e:
+        raise OSError(
+            f"spaCy model '{model}' not found. "
+            f"Install it with: python -m spacy download {model}"
+        ) from e
+
+
+def lemma_cache_key(nlp):
+    """Cached lemmas are only reused for the same spaCy version, model and components."""
+    import spacy
+
+    return {"spacy": spacy.__version__, "model": nlp.meta.get("name"),
+            "version": nlp.meta.get("version"), "pipeline": nlp.pipe_names}
+
+
+def lemmatize(nlp, texts, batch_size=LEMMA_BATCH_SIZE, n_process=None):
+    """Each text as its space-separated lemmas, without punctuation and clitics like 's."""
+    # a worker process per batch at most; starting one costs more than a small batch
+    n_process = n_process or max(1, min(os.cpu_count() or 1, len(texts) // batch_size))
+    return [
+        " ".join(t.lemma_ for t in doc if not (t.is_punct or t.is_space or t.text.startswith("'")))
+        for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process)
+    ]
+
+
+def recall_lemmas(campaigns, nlp=None, cache_path=LEMMA_CACHE_PATH,
+                  batch_size=LEMMA_BATCH_SIZE, n_process=None):
+    """
+    Lemmatized SUMMARY for each row of `campaigns` (NHTSA ID and SUMMARY
+    columns, see term_frequencies.recall_campaigns), in the same order.
+    Campaigns already in the cache with the same summary are not run again.
+    """
+    nlp = nlp or load_lemmatizer()
+    key = lemma_cache_key(nlp)
+    hit = read_cached(cache_path, key) if cache_path else None
+    cache = hit[0] if hit is not None else pd.DataFrame(columns=LEMMA_COLUMNS, dtype=object)
+
+    merged = campaigns[["NHTSA ID", "SUMMARY"]].merge(cache, on=["NHTSA ID", "SUMMARY"], how="left")
+    new = merged["LEMMAS"].isna()
+    if new.any():
+        texts = merged.loc[new, "SUMMARY"].tolist()
+        start = time.perf_counter()
+        merged.loc[new, "LEMMAS"] = lemmatize(nlp, texts, batch_size, n_process)
+        elapsed = time.perf_counter() - start
+        print(f"Lemmatized {len(texts):,} new summaries in {elapsed:.1f}s "
+              f"({len(texts) / elapsed:,.0f} summaries/s), {len(merged) - len(texts):,} from cache")
+        if cache_path:
+            cache = pd.concat([cache, merged.loc[new, LEMMA_COLUMNS]], ignore_index=True)
+            write_cached(cache_path, cache, key, {"campaigns": len(cache)})
+    return merged["LEMMAS"].tolist()
+
+
+if __name__ == "__main__":
+    # throughput for a few batch sizes and process counts, without the cache
+    from preprocess import preprocess_recall_data
+    from term_frequencies import recall_summaries
+
+    recall_path = sys.argv[1] if len(sys.argv) > 1 else "data/recall"
+    summaries = recall_summaries(preprocess_recall_data(recall_path))
+    nlp = load_lemmatizer()
+    print(f"{len(summaries):,} summaries, pipeline: {', '.join(nlp.pipe_names)}")
+    for n_process in sorted({1, os.cpu_count() or 1}):
+        for batch_size in [64, 256, 1000]:
+            start = time.perf_counter()
+            lemmatize(nlp, summaries, batch_size, n_process)
+            elapsed = time.perf_counter() - start
+            print(f"n_process={n_process:<3} batch_size={batch_size:<5}"
+                  f"{len(summaries) / elapsed:>10,.0f} summaries/s")
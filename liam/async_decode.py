@@ -0,0 +1,137 @@
+import asyncio
+import random
+import time
+
+import aiohttp
+
+from vin_cache import FAILED
+
+"""
+Async, batched VIN decoding against the vPIC DecodeVINValuesBatch endpoint.
+
+- up to BATCH_SIZE VINs per request
+- a fixed number of workers sharing one keep-alive connection pool
+- a token bucket caps the request rate
+- failed requests are retried with exponential backoff; batches that still
+  fail are reported and their VINs marked 'Decode failed'
+"""
+
+BATCH_URL = "https://vpic.nhtsa.dot.gov/api/vehicles/DecodeVINValuesBatch/"
+BATCH_SIZE = 50       # vPIC accepts at most 50 VINs per batch call
+CONCURRENCY = 4       # requests in flight
+RATE = 5.0            # requests per second
+RETRIES = 3
+TIMEOUT = 30          # seconds per request
+
+
+class TokenBucket:
+    """Lets `rate` callers per second through, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def format_result(row):
+    """Same 'make;model;year' string the single-VIN decoder produces."""
+    make = row.get('Make') or 'Unknown'
+    model = row.get('Model') or 'Unknown'
+    year = row.get('ModelYear') or 'Unknown'
+    return f"{make};{model};{year}"
+
+
+async def decode_batch(session, vins, bucket, url=BATCH_URL, retries=RETRIES):
+    """Decode one batch. Returns {vin: result}; raises after the last failed retry."""
+    form = {'format': 'json', 'data': ';'.join(vins)}
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            async with session.post(url, data=form) as resp:
+                resp.raise_for_status()
+                rows = (await resp.json(content_type=None))['Results']
+            results = {}
+            for vin, row in zip(vins, rows):
+                results[row.get('VIN') or vin] = format_result(row)
+            for vin in vins:
+                results.setdefault(vin, FAILED)
+            return results
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError):
+            if attempt == retries:
+                raise
+            # back off 0.5s, 1s, 2s, ... with some jitter
+            await asyncio.sleep(0.5 * 2 ** attempt * (1 + random.random()))
+
+
+async def decode_vins_async(vins, url=BATCH_URL, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                            rate=RATE, retries=RETRIES):
+    """Decode an iterable of VINs. Returns ({vin: result}, [(batch, error), ...])."""
+    results = {}
+    failures = []
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    bucket = TokenBucket(rate)
+
+    async def worker(session):
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            try:
+                results.update(await decode_batch(session, batch, bucket, url, retries))
+            except Exception as e:
+                failures.append((batch, f"{type(e).__name__}: {e}"))
+                results.update((vin, FAILED) for vin in batch)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        workers = [asyncio.create_task(worker(session)) for _ in range(concurrency)]
+        batch = []
+        for vin in vins:
+            batch.append(vin)
+            if len(batch) == batch_size:
+                await queue.put(batch)
+                batch = []
+        if batch:
+            await queue.put(batch)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    return results, failures
+
+
+def decode_vins(vins, **kwargs):
+    """Blocking wrapper around decode_vins_async that also reports throughput."""
+    vins = list(vins)
+    start = time.perf_counter()
+    results, failures = asyncio.run(decode_vins_async(vins, **kwargs))
+    elapsed = time.perf_counter() - start
+    print(f"Decoded {len(vins)} VINs in {elapsed:.1f}s ({len(vins) / max(elapsed, 1e-9):.0f} VINs/s), "
+          f"{len(failures)} failed batches")
+    for batch, error in failures:
+        print(f"  batch starting {batch[0]} ({len(batch)} VINs) failed: {error}")
+    return results
+
+
+if __name__ == "__main__":
+    # try it out against the local stub server
+    from vpic_stub import start_stub_server
+
+    server, url = start_stub_server(fail_rate=0.05)
+    alphabet = "ABCDEFGHJKLMNPRSTUVWXYZ0123456789"
+    sample = ["".join(random.choice(alphabet) for _ in range(17)) for _ in range(20_000)]
+    decode_vins(sample, url=url, rate=1000, concurrency=16)
+    server.shutdown()
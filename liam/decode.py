@@ -1,35 +1,149 @@
+import json
+import os
 import pandas as pd
-import requests
-import time  # For rate limiting
+from collections import Counter
 
-df = pd.read_csv('data/large_illinois_dataset.csv', low_memory=False)  # Your 5.36GB file
+from async_decode import decode_vins
+from offline_decode import OfflineDecoder
+from vin_cache import CACHE_PATH, FAILED, VinCache, vin_pattern
+from vin_validate import validate_vins
 
-# clean nans or none or invalid vins
-df = df[df['vin'].notna() & (df['vin'] != 'NONE')].copy()
-print(f"Cleaning done! {len(df)} valid VINs found.")
+INPUT_PATH = 'data/large_illinois_dataset.csv'  # Your 5.36GB file
+# one small CSV shard per input chunk, plus manifest.json recording finished chunks
+OUTPUT_DIR = 'dataset_with_models'
+# rows per chunk; peak memory depends on this, not on the file size
+CHUNK_SIZE = 100_000
 
-print("Starting VIN decoding...")
-def decode_vin(vin):
+
+def iter_vin_chunks(path=INPUT_PATH, chunksize=CHUNK_SIZE, rejected=None):
+    """Stream the dataset chunk by chunk, yielding a Series of valid VINs per chunk.
+
+    Only the `vin` column is parsed, so a chunk costs a few MB however wide the file is.
+    Malformed VINs are dropped here so they never cost a network call; pass a
+    Counter as `rejected` to collect the rejection reasons.
+    """
+    for chunk in pd.read_csv(path, usecols=['vin'], dtype={'vin': str}, chunksize=chunksize):
+        # the raw data has VINs padded with spaces
+        vins = chunk['vin'].str.strip()
+        valid, reasons = validate_vins(vins)
+        if rejected is not None:
+            rejected.update(reasons)
+        yield vins[valid]
+
+
+def decode_chunk(vins, cache, offline=None, **decode_kwargs):
+    """Decode a Series of VINs: offline tables first, then the cache, then the batch decoder.
+
+    Only one VIN per uncached pattern goes to the network. The offline tables
+    learn the new results, and VINs the network could not decode fall back to
+    their make and model year when the WMI is known. Returns a list of
+    'make;model;year' strings aligned with `vins`.
+    """
+    results = {}
+    uniq = vins.unique()
+    if offline is not None:
+        for vin, result in zip(uniq, offline.decode(uniq)):
+            if result is not None:
+                results[vin] = result
+        print(f"{len(results)} of {len(uniq)} distinct VINs resolved offline")
+
+    todo = {}  # one representative VIN per uncached pattern
+    for vin in uniq:
+        if vin in results:
+            continue
+        result = cache.get(vin)
+        if result is None:
+            todo.setdefault(vin_pattern(vin) if len(vin) == 17 else vin, []).append(vin)
+        else:
+            results[vin] = result
+
+    if todo:
+        decoded = decode_vins([group[0] for group in todo.values()], **decode_kwargs)
+        for group in todo.values():
+            result = decoded.get(group[0], FAILED)
+            cache.put(group[0], result)
+            for vin in group:
+                results[vin] = result
+        if offline is not None:
+            representatives = [group[0] for group in todo.values() if len(group[0]) == 17]
+            offline.update([vin_pattern(vin) for vin in representatives],
+                           [results[vin] for vin in representatives])
+            failed = [vin for vin in uniq if results[vin] == FAILED]
+            for vin, result in zip(failed, offline.decode(failed, partial=True)):
+                if result is not None:
+                    results[vin] = result
+    return [results[vin] for vin in vins]
+
+
+def _load_manifest(manifest_path, run_key):
+    """Finished chunk numbers of a previous run with the same input and chunk size."""
     try:
-        try:
-            url = f"https://vpic.nhtsa.dot.gov/api/vehicles/decodevin/{vin}?format=json"
-            resp = requests.get(url, timeout=5)
-            data = resp.json()['Results']
-            make = next((d['Value'] for d in data if d['Variable'] == 'Make'), 'Unknown')
-            model = next((d['Value'] for d in data if d['Variable'] == 'Model'), 'Unknown')
-            year = next((d['Value'] for d in data if d['Variable'] == 'ModelYear'), 'Unknown')
-            print(f"Processed: {make} - {model} - {year}")
-            return f"{make};{model};{year}"
-        except:
-            return 'Decode failed'
-        finally:
-            time.sleep(0.01)  # Avoid rate limits (~5/sec)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if manifest.get('run') != run_key:
+        print("Input or chunk size changed since the last run, starting over.")
+        return set()
+    return set(manifest['done'])
+
+
+def _save_manifest(manifest_path, run_key, done):
+    tmp = manifest_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'run': run_key, 'done': sorted(done)}, f)
+    os.replace(tmp, manifest_path)
+
+
+def shard_path(output_dir, i):
+    return os.path.join(output_dir, f'part-{i:05d}.csv')
+
+
+def read_results(output_dir=OUTPUT_DIR):
+    """Concatenate the finished shards of a (possibly partial) run."""
+    with open(os.path.join(output_dir, 'manifest.json')) as f:
+        done = json.load(f)['done']
+    return pd.concat((pd.read_csv(shard_path(output_dir, i)) for i in done), ignore_index=True)
+
+
+def main(path=INPUT_PATH, output_dir=OUTPUT_DIR, chunksize=CHUNK_SIZE, cache_path=CACHE_PATH, **decode_kwargs):
+    print("Starting VIN decoding...")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    st = os.stat(path)
+    run_key = {'input': os.path.abspath(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+               'chunksize': chunksize, 'validated': True}
+    done = _load_manifest(manifest_path, run_key)
+    if done:
+        print(f"Resuming: {len(done)} chunks already decoded.")
+
+    cache = VinCache(cache_path)
+    # learned from the cache once; decode_chunk adds each chunk's new decodes
+    offline = OfflineDecoder.from_cache(cache)
+    rejected = Counter()
+    # Batch process in chunks for 5M+ rows: each chunk is decoded into its own
+    # shard and checkpointed, so a crash or Ctrl+C only loses the current chunk
+    total = 0
+    try:
+        for i, vins in enumerate(iter_vin_chunks(path, chunksize, rejected)):
+            if i in done:
+                continue
+            out = pd.DataFrame({'vin': vins.values, 'make_model_year': decode_chunk(vins, cache, offline, **decode_kwargs)})
+            out.to_csv(shard_path(output_dir, i) + '.tmp', index=False)
+            os.replace(shard_path(output_dir, i) + '.tmp', shard_path(output_dir, i))
+            cache.commit()
+            done.add(i)
+            _save_manifest(manifest_path, run_key, done)
+            total += len(out)
     except KeyboardInterrupt:
-        print("Decoding interrupted by user. Saving to file...")
-        df.to_csv('dataset_with_models.csv', index=False)
-        exit()
-
-# df['decoded'] = df['vin'].apply(lambda vin: decode_vin(vin))
-# Batch process in chunks for 5M+ rows
-df['make_model_year'] = df['vin'].apply(decode_vin)
-df.to_csv('dataset_with_models.csv', index=False)
+        print(f"Decoding interrupted by user. {len(done)} chunks saved in {output_dir}; run again to resume.")
+        return
+    finally:
+        cache.close()
+        print(cache.report())
+        print(f"Rejected VINs: {dict(rejected)}")
+    print(f"Decoding done! {total} valid VINs decoded this run, {len(done)} chunks in {output_dir}.")
+
+
+if __name__ == "__main__":
+    main()
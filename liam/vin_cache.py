@@ -0,0 +1,86 @@
+import os
+import sqlite3
+
+"""
+Persistent cache for VIN decode results (SQLite).
+
+Results are stored twice: under the exact VIN, and under its decode pattern
+(WMI + VDS + model-year character). Vehicles that share a pattern decode to
+the same make/model/year, so only VINs with a pattern we have never seen need
+to go to the decoder.
+"""
+
+CACHE_PATH = 'data/cache/vin_cache.sqlite'
+FAILED = 'Decode failed'
+
+
+def vin_pattern(vin):
+    """Decode-relevant part of a VIN: positions 1-8 (WMI + VDS) and 10 (model year).
+
+    The check digit (9) and serial number are dropped. For small manufacturers
+    (WMI ending in '9') positions 12-14 complete the WMI, so they are kept.
+    """
+    vin = vin.upper()
+    pattern = vin[:8] + vin[9]
+    if vin[2] == '9':
+        pattern += vin[11:14]
+    return pattern
+
+
+class VinCache:
+    def __init__(self, path=CACHE_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS exact (vin TEXT PRIMARY KEY, result TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS pattern (pattern TEXT PRIMARY KEY, result TEXT NOT NULL)")
+        self.exact_hits = 0
+        self.pattern_hits = 0
+        self.misses = 0
+
+    def get(self, vin):
+        """Cached result for vin (exact match first, then pattern), or None."""
+        row = self.conn.execute("SELECT result FROM exact WHERE vin = ?", (vin,)).fetchone()
+        if row:
+            self.exact_hits += 1
+            return row[0]
+        if len(vin) == 17:
+            row = self.conn.execute("SELECT result FROM pattern WHERE pattern = ?", (vin_pattern(vin),)).fetchone()
+            if row:
+                self.pattern_hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, vin, result):
+        # failures are not cached; they may be network errors worth retrying
+        if result == FAILED:
+            return
+        self.conn.execute("INSERT OR REPLACE INTO exact VALUES (?, ?)", (vin, result))
+        if len(vin) == 17:
+            self.conn.execute("INSERT OR REPLACE INTO pattern VALUES (?, ?)", (vin_pattern(vin), result))
+
+    def patterns(self):
+        """All cached (pattern, result) pairs."""
+        return self.conn.execute("SELECT pattern, result FROM pattern").fetchall()
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def report(self):
+        lookups = self.exact_hits + self.pattern_hits + self.misses
+        if not lookups:
+            return "VIN cache: no lookups"
+        hit_rate = 100.0 * (lookups - self.misses) / lookups
+        return (f"VIN cache: {lookups} lookups, {self.exact_hits} exact hits, "
+                f"{self.pattern_hits} pattern hits, {self.misses} misses ({hit_rate:.1f}% hit rate)")
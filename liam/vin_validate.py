@@ -0,0 +1,72 @@
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from offline_decode import vin_codes
+
+"""
+Vectorized VIN validation, run on whole chunks before anything is decoded.
+
+A VIN is rejected when it is missing, not 17 characters long, contains a
+character outside 0-9/A-Z or one of the illegal letters I, O, Q, or when
+its position-9 check digit does not match (North American VINs).
+"""
+
+# transliteration values; -1 marks characters that can't appear in a VIN
+VALUES = np.full(256, -1, dtype=np.int16)
+for i in range(10):
+    VALUES[ord('0') + i] = i
+for letters, value in [("AJ", 1), ("BKS", 2), ("CLT", 3), ("DMU", 4), ("ENV", 5),
+                       ("FW", 6), ("GPX", 7), ("HY", 8), ("RZ", 9)]:
+    for c in letters:
+        VALUES[ord(c)] = value
+
+WEIGHTS = np.array([8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2], dtype=np.int16)
+
+
+def validate_vins(vins, check_digit=True):
+    """
+    Validate a Series/array of VINs.
+
+    Returns (valid, reasons): a boolean mask aligned with `vins` and a Counter
+    of rejection reasons ('missing', 'length', 'illegal_char', 'check_digit').
+    Surrounding whitespace is ignored; strip the VINs before decoding them.
+    """
+    s = pd.Series(vins).str.strip()
+    missing = (s.isna() | (s == 'NONE')).to_numpy()
+    is17, codes = vin_codes(s)
+    valid = np.zeros(len(s), dtype=bool)
+    reasons = Counter()
+
+    reasons['missing'] = int(missing.sum())
+    reasons['length'] = int((~missing & ~is17).sum())
+
+    values = VALUES[codes]
+    ok = (values >= 0).all(axis=1)
+    reasons['illegal_char'] = int((~ok).sum())
+
+    if check_digit:
+        remainder = (values.astype(np.int32) * WEIGHTS).sum(axis=1) % 11
+        expected = np.where(remainder == 10, ord('X'), ord('0') + remainder)
+        good_check = codes[:, 8] == expected
+        reasons['check_digit'] = int((ok & ~good_check).sum())
+        ok &= good_check
+
+    valid[np.flatnonzero(is17)[ok]] = True
+    return valid, +reasons
+
+
+if __name__ == "__main__":
+    # benchmark on random VINs (only about 1 in 11 has a matching check digit)
+    rng = np.random.default_rng(0)
+    alphabet = np.array(list("ABCDEFGHJKLMNPRSTUVWXYZ0123456789"))
+    n = 2_000_000
+    vins = pd.Series(["".join(rng.choice(alphabet, 17)) for _ in range(10_000)]).sample(n, replace=True, random_state=0)
+
+    start = time.perf_counter()
+    valid, reasons = validate_vins(vins)
+    elapsed = time.perf_counter() - start
+    print(f"{n:,} VINs in {elapsed:.2f}s ({n / elapsed * 60 / 1e6:.0f}M VINs/min), "
+          f"{valid.sum():,} valid, rejected: {dict(reasons)}")
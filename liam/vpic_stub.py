@@ -0,0 +1,62 @@
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+"""
+Local stand-in for the vPIC DecodeVINValuesBatch endpoint, for trying out the
+async decoder without hitting NHTSA. It answers with the same response shape
+({"Count", "Message", "SearchCriteria", "Results": [{"VIN", "Make", ...}]})
+and can fail a fraction of requests to exercise retries.
+"""
+
+YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"  # position 10, 2010-2039
+
+
+def fake_decode(vin):
+    year = YEAR_CODES.find(vin[9]) if len(vin) == 17 else -1
+    return {
+        "VIN": vin,
+        "Make": f"MAKE_{vin[:3]}",
+        "Model": f"MODEL_{vin[3:8]}",
+        "ModelYear": str(2010 + year) if year >= 0 else "",
+        "ErrorCode": "0",
+    }
+
+
+def start_stub_server(port=0, fail_rate=0.0):
+    """Serve the stub on 127.0.0.1 in a background thread. Returns (server, batch_url)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+            if random.random() < fail_rate:
+                self._send(503, {"Message": "Service Unavailable"})
+                return
+            data = parse_qs(body).get("data", [""])[0]
+            vins = [v.split(",")[0].strip() for v in data.split(";") if v.strip()]
+            results = [fake_decode(v) for v in vins]
+            self._send(200, {
+                "Count": len(results),
+                "Message": "Results returned successfully",
+                "SearchCriteria": "",
+                "Results": results,
+            })
+
+        def _send(self, status, payload):
+            out = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/api/vehicles/DecodeVINValuesBatch/"
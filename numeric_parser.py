@@ -0,0 +1,182 @@
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+"""
+Vectorized parser for the messy numeric columns of the Cars 2025 dataset
+(e.g. "1,200 hp", "70 - 80 km/h", "$40,000-$45,000", "2 + 2" seats).
+
+Shared by preprocess.py and tableau_preprocess.py.
+"""
+
+# unit suffixes stripped from each column before parsing
+UNIT_SUFFIXES = {
+    "horsepower": ("hp",),
+    "total_speed": ("km/h",),
+    "performance": ("sec",),
+    "price": ("USD", "$"),
+    "seats": (),
+    "torque": ("Nm",),
+    "battery_capacity": ("cc",),
+}
+
+# a number as the old per-cell code found it inside ranges ("70 - 80" -> 70, 80)
+RANGE_NUMBER = r"\d+\.?\d*"
+# a number as float() accepts it inside an "a + b" sum
+SUM_TERM = r"-?(?:\d+\.?\d*|\.\d+)(?:[eE]-?\d+)?"
+SUM_PATTERN = rf"\s*{SUM_TERM}\s*(?:\+\s*{SUM_TERM}\s*)+"
+
+
+def _number_table(s, pattern):
+    """
+    Pull every match of `pattern` out of each string of `s` into a float
+    table (one row per string, one column per match, padded with NaN).
+    """
+    n_matches = s.str.count(pattern).to_numpy()
+    width = int(n_matches.max()) if len(s) else 0
+    table = np.full((len(s), max(width, 2)), np.nan)
+
+    # most values hold one or two numbers -> one fixed-shape extract
+    short = n_matches <= 2
+    if short.any():
+        two = s[short].str.extract(rf"^\D*({pattern})?\D*({pattern})?\D*$")
+        table[short, :2] = two.astype(float).to_numpy()
+
+    # the odd value with more numbers goes through extractall
+    if (~short).any():
+        rest = s[~short].reset_index(drop=True).str.extractall(f"({pattern})")[0].astype(float)
+        rows = np.flatnonzero(~short)[rest.index.get_level_values(0)]
+        table[rows, rest.index.get_level_values(1)] = rest.to_numpy()
+    return table
+
+
+def _row_mean(table):
+    """Left-to-right sum / count of each row, NaN when the row is empty."""
+    counts = np.count_nonzero(~np.isnan(table), axis=1)
+    sums = np.nansum(table, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _parse_unique(values, bad_sum_as_nan):
+    """Parse an array of distinct strings into floats."""
+    s = pd.Series(values, dtype=object).fillna("").str.replace(",", "", regex=False).str.strip()
+    out = np.full(len(s), np.nan)
+
+    is_sum = s.str.contains("+", regex=False).to_numpy(dtype=bool)
+    valid_sum = is_sum.copy()
+    valid_sum[is_sum] = s[is_sum].str.fullmatch(SUM_PATTERN).to_numpy(dtype=bool)
+
+    # Case 1: arithmetic like "2 + 2"
+    if valid_sum.any():
+        terms = s[valid_sum].reset_index(drop=True).str.extractall(f"({SUM_TERM})")[0]
+        table = terms.astype(float).unstack().to_numpy(dtype=float)
+        out[valid_sum] = np.nansum(table, axis=1)
+
+    # Case 2: numeric ranges or single values (averaged)
+    use_range = ~valid_sum
+    if bad_sum_as_nan:
+        use_range &= ~is_sum
+    if use_range.any():
+        out[use_range] = _row_mean(_number_table(s[use_range], RANGE_NUMBER))
+
+    return out
+
+
+def parse_numeric(series, units=(), bad_sum_as_nan=False):
+    """
+    Convert a column of strings like "70 - 80 km/h" or "2 + 2" to floats.
+
+    - thousands separators are dropped
+    - "a + b" is summed
+    - "a - b" (or any text with several numbers) is averaged
+    - text without numbers becomes NaN
+
+    `units` are removed before parsing. If `bad_sum_as_nan` is True a value
+    with a "+" that is not a clean sum becomes NaN, otherwise its numbers
+    are averaged like a range.
+
+    Each distinct value is only parsed once, so repeated catalog entries are
+    almost free.
+    """
+    s = series.astype(str)
+    for unit in units:
+        s = s.str.replace(unit, "", regex=False)
+
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    parsed = _parse_unique(np.asarray(uniques, dtype=object), bad_sum_as_nan)
+    return pd.Series(parsed[codes], index=series.index, dtype=float)
+
+
+def parse_numeric_columns(df, bad_sum_as_nan=False):
+    """Parse every column in UNIT_SUFFIXES in place and return df."""
+    for col, units in UNIT_SUFFIXES.items():
+        df[col] = parse_numeric(df[col], units, bad_sum_as_nan=bad_sum_as_nan)
+    return df
+
+
+# ---------- Benchmark ----------
+
+def _legacy_handle_range(val):
+    # the per-cell parser that preprocess_cars2025 used to run via Series.apply
+    if pd.isna(val):
+        return np.nan
+    s = str(val).replace(",", "").strip()
+    if "+" in s:
+        try:
+            return sum(float(x) for x in s.split("+"))
+        except Exception:
+            pass
+    nums = re.findall(r"\d+\.?\d*", s)
+    if not nums:
+        return np.nan
+    return np.mean(list(map(float, nums)))
+
+
+def _legacy_parse(series, units):
+    s = series.astype(str)
+    for unit in units:
+        s = s.str.replace(unit, "", regex=False)
+    return s.apply(_legacy_handle_range)
+
+
+def _synthetic_catalog(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    hp = rng.integers(70, 1500, n_rows)
+    speed = rng.integers(120, 400, n_rows)
+    accel = rng.uniform(2.0, 15.0, n_rows).round(1)
+    price = rng.integers(8_000, 3_000_000, n_rows)
+    torque = rng.integers(90, 1600, n_rows)
+    cc = rng.integers(600, 8000, n_rows)
+    ranged = rng.random(n_rows) < 0.2
+    return pd.DataFrame({
+        "horsepower": np.where(ranged, [f"{a}-{a + 40} hp" for a in hp], [f"{a} hp" for a in hp]),
+        "total_speed": [f"{a} km/h" for a in speed],
+        "performance": [f"{a} sec" for a in accel],
+        "price": np.where(ranged, [f"${a:,} - ${a + 5000:,}" for a in price], [f"${a:,}" for a in price]),
+        "seats": rng.choice(["2", "4", "5", "7", "2 + 2", "5-7", None], n_rows),
+        "torque": [f"{a} Nm" for a in torque],
+        "battery_capacity": [f"{a:,} cc" for a in cc],
+    })
+
+
+def benchmark(n_rows=1_000_000):
+    raw = _synthetic_catalog(n_rows)
+
+    start = time.perf_counter()
+    legacy = pd.DataFrame({col: _legacy_parse(raw[col], units) for col, units in UNIT_SUFFIXES.items()})
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = parse_numeric_columns(raw.copy())
+    fast_time = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(legacy, fast[list(UNIT_SUFFIXES)], check_dtype=False)
+    print(f"{n_rows:,} rows: per-cell {legacy_time:.2f}s, vectorized {fast_time:.2f}s "
+          f"({legacy_time / fast_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,31 @@
+import base64
+
+import numpy as np
+
+"""
+Numeric arrays as base64 strings, for the data viz3 (client-side mode) and
+viz5 (compact HTML) ship to the browser. A packed array is its raw
+little-endian bytes, a fraction of the size of the same numbers as JSON
+text; JS_UNPACK turns it back into a JS typed array.
+"""
+
+# JS typed array per byte width of pack_uint's values
+JS_UNPACK = """
+function unpack(b64, Type) {
+    return new Type(Uint8Array.from(atob(b64), c => c.charCodeAt(0)).buffer);
+}
+const UINT = {1: Uint8Array, 2: Uint16Array, 4: Uint32Array};
+"""
+
+
+def pack(values, dtype):
+    """Array as base64 of its little-endian bytes (unpack(b64, <matching typed array>) in JS)."""
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode("ascii")
+
+
+def pack_uint(values):
+    """(base64, bytes per value) using the smallest unsigned type that fits the values (see UINT in JS_UNPACK)."""
+    values = np.asarray(values)
+    top = values.max() if values.size else 0
+    width = 1 if top < 2 ** 8 else 2 if top < 2 ** 16 else 4
+    return pack(values, f"<u{width}"), width
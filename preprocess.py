@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
-import re
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from disk_cache import CACHE_DIR, cached
+from numeric_parser import parse_numeric_columns
 
 def preprocess_cars2025(df):
     # --- Rename columns for consistency ---
@@ -22,34 +25,8 @@ def preprocess_cars2025(df):
     # --- Remove duplicates and work on a copy ---
     df = df.drop_duplicates().copy()
 
-    # --- Helper to handle ranges and arithmetic ---
-    def handle_range(val):
-        if pd.isna(val):
-            return np.nan
-        s = str(val).replace(",", "").strip()
-
-        # Case 1: arithmetic like "2 + 2"
-        if "+" in s:
-            try:
-                parts = [float(x) for x in s.split("+")]
-                return sum(parts)
-            except Exception:
-                pass
-
-        # Case 2: numeric ranges or single values
-        nums = re.findall(r"\d+\.?\d*", s)
-        if not nums:
-            return np.nan
-        return np.mean(list(map(float, nums)))
-
-    # --- Clean numeric columns ---
-    df["horsepower"] = df["horsepower"].astype(str).str.replace("hp", "", regex=False).apply(handle_range)
-    df["total_speed"] = df["total_speed"].astype(str).str.replace("km/h", "", regex=False).apply(handle_range)
-    df["performance"] = df["performance"].astype(str).str.replace("sec", "", regex=False).apply(handle_range)
-    df["price"] = df["price"].astype(str).str.replace("USD", "", regex=False).str.replace("$", "", regex=False).apply(handle_range)
-    df["seats"] = df["seats"].apply(handle_range)
-    df["torque"] = df["torque"].astype(str).str.replace("Nm", "", regex=False).apply(handle_range)
-    df["battery_capacity"] = df["battery_capacity"].astype(str).str.replace("cc", "", regex=False).apply(handle_range)
+    # --- Clean numeric columns (ranges, sums, units) ---
+    df = parse_numeric_columns(df)
 
     # --- Convert all numeric columns to floats ---
     numeric_cols = ["price", "horsepower", "performance", "total_speed", "seats", "torque", "battery_capacity"]
@@ -65,25 +42,174 @@ def preprocess_cars2025(df):
 
     return df
 
+# US listings (viz6_discarded)
+US_SALES_CACHE_PATH = os.path.join(CACHE_DIR, "us_sales.parquet")
+US_SALES_NUMERIC_COLUMNS = {"Year": "Int16", "Price": "float64", "Mileage": "float64"}
+US_SALES_CATEGORY_COLUMNS = ["Brand", "Model", "Status", "Dealer"]
+US_SALES_MISSING = ["", "None", "nan"]
+CERTIFIED_STATUSES = {
+    "Certified Pre-Owned": "Certified",
+    "certified pre-owned": "Certified",
+    "Certified Pre-owned": "Certified",
+    "Certified Pre Owned": "Certified",
+}
+US_SALES_SCHEMA_VERSION = 1
+
+def _clean_categories(values, replace=None):
+    """Strip (and rename) the categories of a categorical column; empty ones become NaN."""
+    labels = pd.Series(values.cat.categories.astype(str).str.strip())
+    if replace:
+        labels = labels.replace(replace)
+    labels = labels.where(~labels.isin(US_SALES_MISSING))
+    categories = sorted(labels.dropna().unique())
+    # old code -> new code; the extra -1 at the end keeps missing values (code -1) missing
+    lookup = np.append(pd.Index(categories).get_indexer(labels), -1)
+    return pd.Categorical.from_codes(lookup[values.cat.codes.to_numpy()], categories=categories)
+
+def clean_us_sales(csv_path):
+    """
+    Read and clean the US listings CSV (UTF-16): Year/Price/Mileage parsed
+    as numbers while reading, the text columns as categoricals that are
+    stripped once per distinct value instead of once per row.
+    """
+    header = pd.read_csv(csv_path, encoding="utf-16", nrows=0).columns
+    names = {c.strip(): c for c in header}
+    numeric = {names[c]: t for c, t in US_SALES_NUMERIC_COLUMNS.items() if c in names}
+    dtype = dict(numeric, **{names[c]: "category" for c in US_SALES_CATEGORY_COLUMNS if c in names})
+    options = dict(encoding="utf-16", usecols=list(dtype), thousands=",")
+    try:
+        df = pd.read_csv(csv_path, dtype=dtype, **options)
+    except ValueError:
+        # some numeric field is not a number: read those columns as text and coerce
+        df = pd.read_csv(csv_path, dtype=dict(dtype, **{c: str for c in numeric}), **options)
+        for c, t in numeric.items():
+            df[c] = pd.to_numeric(df[c].str.replace(",", "", regex=False), errors="coerce").astype(t)
+    df.columns = [c.strip() for c in df.columns]
+    for c in US_SALES_CATEGORY_COLUMNS:
+        if c in df.columns:
+            df[c] = _clean_categories(df[c], CERTIFIED_STATUSES if c == "Status" else None)
+    return df
+
+def load_us_sales(csv_path, cache_path=US_SALES_CACHE_PATH):
+    """Cleaned US listings, from the Parquet cache while the CSV is unchanged."""
+    return cached(csv_path, cache_path, clean_us_sales, version=US_SALES_SCHEMA_VERSION)
+
 # datasource 4
-def preprocess_recall_data(recall_path):
-    # combine all csv files inside the folder path "recall_path"
-    df = pd.concat([pd.read_csv(os.path.join(recall_path, f)) 
-                    for f in os.listdir(recall_path) 
-                    if f.endswith('.csv')], 
-                    ignore_index=True
-                  )
-    # columns: "NHTSA ID","DOCUMENT NAME","MAKE","MODEL","MODEL YEAR","SUMMARY"
-    # convert columns to their respective types
-    df["NHTSA ID"] = df["NHTSA ID"].astype(str).str.strip()
-    df["DOCUMENT NAME"] = df["DOCUMENT NAME"].astype(str).str.strip()
-    df["MAKE"] = df["MAKE"].astype(str).str.strip()
-    df["MODEL"] = df["MODEL"].astype(str).str.strip()
-    df["MODEL YEAR"] = pd.to_numeric(df["MODEL YEAR"], errors="coerce")
-    df["SUMMARY"] = df["SUMMARY"].astype(str).str.strip()
+RECALL_CACHE_DIR = os.path.join(CACHE_DIR, "recall")
+RECALL_COLUMNS = ["NHTSA ID", "DOCUMENT NAME", "MAKE", "MODEL", "MODEL YEAR", "SUMMARY"]
+RECALL_TEXT_COLUMNS = ["NHTSA ID", "DOCUMENT NAME", "MAKE", "MODEL", "SUMMARY"]
+# every text column is dictionary-encoded: a campaign's SUMMARY and
+# DOCUMENT NAME are stored once no matter how many make/model/year rows it has
+RECALL_CATEGORY_COLUMNS = RECALL_TEXT_COLUMNS
+RECALL_SCHEMA_VERSION = 3
+
+def clean_recall_file(path):
+    """Read and clean one recall CSV. Returns (df, number of raw rows)."""
+    # only the six known columns, all read as text; MODEL YEAR is parsed below
+    try:
+        df = pd.read_csv(path, usecols=RECALL_COLUMNS, dtype=str)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from e
+    raw_rows = len(df)
+
+    for col in RECALL_TEXT_COLUMNS:
+        df[col] = df[col].str.strip()
+    df["MODEL YEAR"] = pd.to_numeric(df["MODEL YEAR"].str.strip(), errors="coerce")
     # remove duplicates
-    df = df.drop_duplicates().copy()
+    df = df.drop_duplicates()
     # remove all rows where "MODEL YEAR" is 9999 or NaN
-    df = df[df["MODEL YEAR"].notna() & (df["MODEL YEAR"] != 9999)]
+    df = df[df["MODEL YEAR"].notna() & (df["MODEL YEAR"] != 9999)].copy()
+
+    df["MODEL YEAR"] = df["MODEL YEAR"].astype("int16")
+    for col in RECALL_CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+    return df, raw_rows
+
+def _clean_recall_file_with_meta(path):
+    df, raw_rows = clean_recall_file(path)
+    return df, {"rows": raw_rows}
+
+def _load_recall_file(path, cache_dir):
+    """Cleaned frame + raw row count for one file, from the cache if possible."""
+    if not cache_dir:
+        return clean_recall_file(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    part, meta = cached(path, os.path.join(cache_dir, name + ".parquet"), _clean_recall_file_with_meta,
+                        version=RECALL_SCHEMA_VERSION, meta=True)
+    return part, meta["rows"]
+
+def _unify_categories(frames, columns):
+    # concat only keeps a categorical dtype when all parts share the categories
+    for col in columns:
+        categories = sorted(set().union(*(f[col].cat.categories for f in frames)))
+        for f in frames:
+            f[col] = f[col].cat.set_categories(categories)
+
+def recall_files(recall_path):
+    return [os.path.join(recall_path, f) for f in os.listdir(recall_path) if f.endswith('.csv')]
+
+def preprocess_recall_data(recall_path, cache_dir=RECALL_CACHE_DIR, max_workers=None, processes=True):
+    """
+    Combine and clean all recall CSV files inside the folder `recall_path`.
+
+    Files are read and cleaned in a process pool, one file per task: CSV
+    parsing and the string cleanup hold the GIL, so threads would not use
+    more than one core. The calling script needs an `if __name__ == "__main__"`
+    guard; code that runs at import time passes processes=False to use
+    threads instead. Each cleaned file is cached as Parquet until it changes
+    on disk, so adding a recall CSV only parses that one file.
+    """
+    paths = recall_files(recall_path)
+    if not paths:
+        raise ValueError(f"No recall CSV files found in {recall_path}")
+
+    pool_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    max_workers = max_workers or min(len(paths), os.cpu_count() or 1)
+    with pool_cls(max_workers=max_workers) as pool:
+        results = list(pool.map(_load_recall_file, paths, [cache_dir] * len(paths)))
+
+    frames = []
+    offset = 0
+    for part, raw_rows in results:
+        # keep the row labels of one big concatenated frame
+        part.index = part.index + offset
+        offset += raw_rows
+        frames.append(part)
+    _unify_categories(frames, RECALL_CATEGORY_COLUMNS)
+
+    df = pd.concat(frames)
+    # remove duplicates across files
+    df = df.drop_duplicates()
 
     return df
+
+def recall_year_counts(df):
+    """
+    Distinct recall campaigns (NHTSA IDs) per make/model/model year, per
+    make/year, per model/year and per make: everything viz3 needs, so it can
+    run on these small tables instead of the full recall frame.
+    """
+    def nunique(keys):
+        return df.groupby(keys, observed=True)["NHTSA ID"].nunique().reset_index()
+
+    return {
+        "make_model_year": nunique(["MAKE", "MODEL", "MODEL YEAR"]),
+        "make_year": nunique(["MAKE", "MODEL YEAR"]),
+        "model_year": nunique(["MODEL", "MODEL YEAR"]),
+        "make_campaigns": nunique(["MAKE"]),
+    }
+
+def recall_memory_report(df):
+    """Print the footprint of the recall frame next to a plain object/int64 copy of it."""
+    plain = df.astype({col: object for col in RECALL_TEXT_COLUMNS}).astype({"MODEL YEAR": "int64"})
+    before = plain.memory_usage(deep=True, index=False)
+    after = df.memory_usage(deep=True, index=False)
+    mb = 1024 ** 2
+    print(f"{'column':<15}{'plain MB':>12}{'compact MB':>12}")
+    for col in df.columns:
+        print(f"{col:<15}{before[col] / mb:>12.1f}{after[col] / mb:>12.1f}")
+    print(f"{'total':<15}{before.sum() / mb:>12.1f}{after.sum() / mb:>12.1f}"
+          f"  ({before.sum() / after.sum():.1f}x smaller, {len(df):,} rows)")
+
+if __name__ == "__main__":
+    recall_memory_report(preprocess_recall_data("data/recall"))
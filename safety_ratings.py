@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+from disk_cache import CACHE_DIR, cached
+
+"""
+Shared loader for the NHTSA safety-ratings CSV used by viz5 and viz5.1.
+
+Only the columns the visualizations use are read: MAKE/MODEL as categories,
+MODEL_YR as a nullable small int and the star ratings and weights as floats
+("Not Rated" and other text become NaN). The cleaned frame is cached as
+Parquet until the CSV changes.
+"""
+
+SAFETY_RATINGS_PATH = "data/safety_ratings.csv"
+SAFETY_CACHE_PATH = os.path.join(CACHE_DIR, "safety_ratings.parquet")
+SAFETY_CATEGORY_COLUMNS = ["MAKE", "MODEL"]
+SAFETY_NUMERIC_COLUMNS = ["ROLLOVER_STARS", "OVERALL_STARS", "CURB_WEIGHT", "MIN_GROSS_WEIGHT"]
+SAFETY_COLUMNS = SAFETY_CATEGORY_COLUMNS + ["MODEL_YR"] + SAFETY_NUMERIC_COLUMNS
+SAFETY_SCHEMA_VERSION = 1
+
+
+def _read_options():
+    dtype = {col: "category" for col in SAFETY_CATEGORY_COLUMNS}
+    dtype.update({col: str for col in ["MODEL_YR"] + SAFETY_NUMERIC_COLUMNS})
+    return dict(usecols=SAFETY_COLUMNS, dtype=dtype)
+
+
+def _coerce(df):
+    df["MODEL_YR"] = pd.to_numeric(df["MODEL_YR"], errors="coerce").astype("Int16")
+    for col in SAFETY_NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    return df[SAFETY_COLUMNS]
+
+
+def clean_safety_ratings(path=SAFETY_RATINGS_PATH):
+    """Read the needed columns of the safety-ratings CSV and give them proper dtypes."""
+    return _coerce(pd.read_csv(path, **_read_options()))
+
+
+def iter_safety_ratings(path=SAFETY_RATINGS_PATH, chunksize=500_000):
+    """Same as clean_safety_ratings, one chunk of rows at a time (for files larger than RAM)."""
+    for chunk in pd.read_csv(path, chunksize=chunksize, **_read_options()):
+        yield _coerce(chunk)
+
+
+def weight_rollover_rows(df):
+    """
+    Rows usable for the weight vs rollover chart (viz5.1), with WEIGHT_TONS
+    from the curb weight, or the minimum gross weight when that is missing.
+    """
+    df = df.copy()
+    df['WEIGHT_LBS'] = df['CURB_WEIGHT'].combine_first(df['MIN_GROSS_WEIGHT'])
+    df['WEIGHT_TONS'] = df['WEIGHT_LBS'] / 2000
+    df = df.dropna(subset=['WEIGHT_TONS', 'ROLLOVER_STARS', 'MAKE', 'MODEL'])
+    df = df[(df['WEIGHT_TONS'] > 0.5) & (df['WEIGHT_TONS'] < 10)]
+    df = df[(df['ROLLOVER_STARS'] >= 0) & (df['ROLLOVER_STARS'] <= 5)]
+    return df
+
+
+def load_safety_ratings(path=SAFETY_RATINGS_PATH, cache_path=SAFETY_CACHE_PATH):
+    """Cleaned safety ratings, from the Parquet cache while the CSV is unchanged."""
+    return cached(path, cache_path, clean_safety_ratings, version=SAFETY_SCHEMA_VERSION)
+
+
+if __name__ == "__main__":
+    # compare against the old way of loading it: every column, inferred types
+    path = sys.argv[1] if len(sys.argv) > 1 else SAFETY_RATINGS_PATH
+    mb = 1024 ** 2
+    load_safety_ratings(path)  # make sure the cache is filled
+    for label, load in [
+        ("read_csv (all columns)", lambda: pd.read_csv(path, low_memory=False)),
+        ("clean_safety_ratings", lambda: clean_safety_ratings(path)),
+        ("load_safety_ratings (cached)", lambda: load_safety_ratings(path)),
+    ]:
+        start = time.perf_counter()
+        df = load()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<30}{elapsed:>8.2f}s{df.memory_usage(deep=True).sum() / mb:>10.1f} MB")
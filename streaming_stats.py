@@ -0,0 +1,191 @@
+import math
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from safety_ratings import SAFETY_RATINGS_PATH, iter_safety_ratings, weight_rollover_rows
+
+"""
+Out-of-core statistics for the weight vs rollover chart (viz5.1).
+
+The trend line (same numbers as scipy.stats.linregress) and the 5
+weight-group averages (same groups as pd.cut(x, bins=5)) are accumulated
+chunk by chunk, so the input never has to fit in memory:
+
+- RegressionStats keeps n, min/max x, the means and the centered sums of
+  squares and cross products. Merging uses the pairwise update of Chan et
+  al.; raw sums like sum(x**2) would lose most of their precision to
+  cancellation on large inputs.
+- BinStats keeps per-bin counts and sums for fixed edges. pd.cut derives
+  its edges from the min and max, so the edges come from a first pass.
+
+Both are plain picklable objects: accumulate them in separate processes
+(one per file or chunk range) and merge the results.
+"""
+
+LinearFit = namedtuple("LinearFit", "slope intercept rvalue pvalue stderr")
+# everything the chart needs: the fit (None when there is no line to fit),
+# the x extent and the per-bin results
+WeightSummary = namedtuple("WeightSummary", "fit x_min x_max intervals means counts")
+
+
+class RegressionStats:
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sxx = 0.0  # sum((x - mean_x) ** 2)
+        self.syy = 0.0
+        self.sxy = 0.0  # sum((x - mean_x) * (y - mean_y))
+        self.min_x = math.inf
+        self.max_x = -math.inf
+
+    @classmethod
+    def from_arrays(cls, x, y):
+        s = cls()
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x):
+            s.n = len(x)
+            s.mean_x = float(x.mean())
+            s.mean_y = float(y.mean())
+            dx = x - s.mean_x
+            dy = y - s.mean_y
+            s.sxx = float(dx @ dx)
+            s.syy = float(dy @ dy)
+            s.sxy = float(dx @ dy)
+            s.min_x = float(x.min())
+            s.max_x = float(x.max())
+        return s
+
+    def update(self, x, y):
+        return self.merge(RegressionStats.from_arrays(x, y))
+
+    def merge(self, other):
+        if not other.n:
+            return self
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        w = self.n * other.n / n
+        self.sxx += other.sxx + dx * dx * w
+        self.syy += other.syy + dy * dy * w
+        self.sxy += other.sxy + dx * dy * w
+        self.mean_x += dx * other.n / n
+        self.mean_y += dy * other.n / n
+        self.min_x = min(self.min_x, other.min_x)
+        self.max_x = max(self.max_x, other.max_x)
+        self.n = n
+        return self
+
+    def fit(self):
+        """Least-squares line, computed the way scipy.stats.linregress does."""
+        if self.n < 2:
+            raise ValueError("Need at least two points for a linear regression")
+        if self.sxx == 0:
+            raise ValueError("Cannot calculate a linear regression if all x values are identical")
+        ssxm, ssym, ssxym = self.sxx / self.n, self.syy / self.n, self.sxy / self.n
+        r = 0.0 if ssym == 0 else max(-1.0, min(1.0, ssxym / math.sqrt(ssxm * ssym)))
+        slope = ssxym / ssxm
+        intercept = self.mean_y - slope * self.mean_x
+        df = self.n - 2
+        if df == 0:
+            return LinearFit(slope, intercept, r, 1.0 if ssym == 0 else 0.0, 0.0)
+        tiny = 1.0e-20
+        t = r * math.sqrt(df / ((1.0 - r + tiny) * (1.0 + r + tiny)))
+        pvalue = float(2 * stats.t.sf(abs(t), df))
+        stderr = math.sqrt((1 - r ** 2) * ssym / ssxm / df)
+        return LinearFit(slope, intercept, r, pvalue, stderr)
+
+
+def cut_bins(x_min, x_max, bins=5):
+    """(edges, interval labels) of pd.cut(x, bins) for data spanning [x_min, x_max]."""
+    labels, edges = pd.cut(np.array([x_min, x_max]), bins=bins, retbins=True)
+    return edges, labels.categories
+
+
+class BinStats:
+    """Counts and sums of y per right-closed (edges[i], edges[i + 1]] bin of x."""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.sums = np.zeros(len(self.edges) - 1, dtype=np.float64)
+
+    def update(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        idx = np.searchsorted(self.edges, x, side="left") - 1
+        inside = (idx >= 0) & (idx < len(self.counts))
+        self.counts += np.bincount(idx[inside], minlength=len(self.counts))
+        self.sums += np.bincount(idx[inside], weights=y[inside], minlength=len(self.counts))
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.sums += other.sums
+        return self
+
+    def means(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sums / self.counts
+
+
+def summarize(chunks, bins=5):
+    """
+    WeightSummary from `chunks`, a callable returning a fresh iterable of
+    (x, y) array pairs; it is iterated twice (the bin edges need the min/max).
+    Bins without any rows are kept with a NaN mean and a count of 0, like
+    groupby on the pd.cut result with observed=False.
+    """
+    regression = RegressionStats()
+    for x, y in chunks():
+        regression.update(x, y)
+    if not regression.n:
+        raise ValueError("No rows to summarize")
+    edges, intervals = cut_bins(regression.min_x, regression.max_x, bins)
+    binned = BinStats(edges)
+    for x, y in chunks():
+        binned.update(x, y)
+    fit = regression.fit() if regression.n > 1 and regression.sxx > 0 else None
+    return WeightSummary(fit, regression.min_x, regression.max_x,
+                         list(intervals), binned.means(), binned.counts)
+
+
+def summarize_frame(df_clean, bins=5):
+    """WeightSummary of an in-memory frame with WEIGHT_TONS and ROLLOVER_STARS."""
+    x = df_clean['WEIGHT_TONS'].to_numpy(dtype=np.float64)
+    y = df_clean['ROLLOVER_STARS'].to_numpy(dtype=np.float64)
+    return summarize(lambda: [(x, y)], bins)
+
+
+def summarize_csv(path=SAFETY_RATINGS_PATH, chunksize=500_000, bins=5):
+    """WeightSummary of a safety-ratings CSV, reading it chunk by chunk."""
+    def chunks():
+        for chunk in iter_safety_ratings(path, chunksize):
+            rows = weight_rollover_rows(chunk)
+            yield rows['WEIGHT_TONS'].to_numpy(), rows['ROLLOVER_STARS'].to_numpy()
+    return summarize(chunks, bins)
+
+
+if __name__ == "__main__":
+    # streaming vs in-memory on the same file
+    from safety_ratings import clean_safety_ratings
+
+    path = sys.argv[1] if len(sys.argv) > 1 else SAFETY_RATINGS_PATH
+    start = time.perf_counter()
+    streamed = summarize_csv(path, chunksize=100_000)
+    print(f"streamed in {time.perf_counter() - start:.2f}s")
+
+    df_clean = weight_rollover_rows(clean_safety_ratings(path))
+    reference = stats.linregress(df_clean['WEIGHT_TONS'], df_clean['ROLLOVER_STARS'])
+    weight_bins = pd.cut(df_clean['WEIGHT_TONS'], bins=5)
+    bin_means = df_clean.groupby(weight_bins, observed=False)['ROLLOVER_STARS'].mean()
+    for name in LinearFit._fields:
+        print(f"{name:<10}{getattr(streamed.fit, name):>24.16g}{getattr(reference, name):>24.16g}")
+    print(f"bins equal: {list(bin_means.index) == streamed.intervals}, "
+          f"max mean difference: {np.nanmax(np.abs(bin_means.to_numpy() - streamed.means)):.3g}")
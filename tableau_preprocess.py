@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-import re
+
+from numeric_parser import parse_numeric_columns
 
 def preprocess_cars2025(df):
     df = df.rename(columns={
@@ -19,32 +20,7 @@ def preprocess_cars2025(df):
 
     df = df.drop_duplicates().copy()
 
-    def handle_range(val):
-        if pd.isna(val):
-            return np.nan
-        s = str(val).replace(",", "").strip()
-
-        # Case 1: arithmetic like "2 + 2"
-        if "+" in s:
-            try:
-                parts = [float(x) for x in s.split("+")]
-                return sum(parts)
-            except Exception:
-                return np.nan
-
-        # Case 2: numeric ranges or single values
-        nums = re.findall(r"\d+\.?\d*", s)
-        if not nums:
-            return np.nan
-        return np.mean(list(map(float, nums)))
-
-    df["horsepower"] = df["horsepower"].astype(str).str.replace("hp", "", regex=False).apply(handle_range)
-    df["total_speed"] = df["total_speed"].astype(str).str.replace("km/h", "", regex=False).apply(handle_range)
-    df["performance"] = df["performance"].astype(str).str.replace("sec", "", regex=False).apply(handle_range)
-    df["price"] = df["price"].astype(str).str.replace("USD", "", regex=False).str.replace("$", "", regex=False).apply(handle_range)
-    df["seats"] = df["seats"].apply(handle_range)
-    df["torque"] = df["torque"].astype(str).str.replace("Nm", "", regex=False).apply(handle_range)
-    df["battery_capacity"] = df["battery_capacity"].astype(str).str.replace("cc", "", regex=False).apply(handle_range)
+    df = parse_numeric_columns(df, bad_sum_as_nan=True)
 
     numeric_cols = ["price", "horsepower", "performance", "total_speed", "seats", "torque", "battery_capacity"]
     df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
@@ -0,0 +1,213 @@
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from math import log
+from operator import itemgetter
+
+import pandas as pd
+from wordcloud import STOPWORDS
+
+"""
+Term frequencies for the recall wordcloud (viz4), for
+WordCloud.generate_from_frequencies.
+
+Instead of joining every SUMMARY into one string for WordCloud.generate,
+each campaign's summary is counted once (recall rows repeat it for every
+make/model/year), in chunks across a process pool. Workers return raw
+unigram/bigram counters that are merged as they arrive, so memory grows
+with the vocabulary, not the text.
+
+The result is what WordCloud.generate would compute (same tokenizer,
+stopwords, case and plural folding, and collocation scoring), except that
+a bigram never spans two summaries.
+"""
+
+TOKEN_PATTERN = re.compile(r"\w[\w']*")  # WordCloud's default with min_word_length <= 1
+
+# Base stopwords + some recall-specific ones to avoid boring words
+RECALL_STOPWORDS = set(STOPWORDS) | {
+    "recall", "vehicle", "vehicles", "honda", "acura", "toyota", "ford",
+    "customer", "service", "team", "contacting", "urgent", "safety",
+    "please", "may", "could", "cause", "affected", "owners", "owner",
+    "dealers", "dealer", "free", "charge", "repair", "repairs",
+    # "notice", "followup", "follow", "bulletin", "information", "additional",
+    # "part", "parts", "system", "systems", "may", "will", "also", "one",
+    # "two", "use", "used", "using", "within", "without", "including",
+    # "ensure", "ensure", "check", "checks", "checking"
+}
+
+CHUNK_SIZE = 2_000  # summaries per pool task
+
+
+def tokenize(text):
+    """WordCloud.process_text's tokens: drop trailing 's and pure numbers."""
+    words = (w[:-2] if w.lower().endswith("'s") else w for w in TOKEN_PATTERN.findall(text))
+    return [w for w in words if not w.isdigit()]
+
+
+def _likelihood(k, n, x):
+    # Dunning's likelihood ratio, as in wordcloud.tokenization
+    return log(max(x, 1e-10)) * k + log(max(1 - x, 1e-10)) * (n - k)
+
+
+def _collocation_score(count_bigram, count1, count2, n_words):
+    """wordcloud.tokenization.score: how strongly two words go together."""
+    if n_words <= count1 or n_words <= count2:
+        # only one word appears in the whole text
+        return 0
+    p = count2 / n_words
+    p1 = count_bigram / count1
+    p2 = (count2 - count_bigram) / (n_words - count1)
+    score = (_likelihood(count_bigram, count1, p) + _likelihood(count2 - count_bigram, n_words - count1, p)
+             - _likelihood(count_bigram, count1, p1) - _likelihood(count2 - count_bigram, n_words - count1, p2))
+    return -2 * score
+
+
+def _fuse(counts, normalize_plurals=True):
+    """wordcloud.tokenization.process_tokens on counted words (in first-seen order)."""
+    d = defaultdict(dict)
+    for word, count in counts.items():
+        case_dict = d[word.lower()]
+        case_dict[word] = case_dict.get(word, 0) + count
+    merged_plurals = {}
+    if normalize_plurals:
+        for key in list(d.keys()):
+            if key.endswith('s') and not key.endswith("ss"):
+                key_singular = key[:-1]
+                if key_singular in d:
+                    dict_singular = d[key_singular]
+                    for word, count in d[key].items():
+                        dict_singular[word[:-1]] = dict_singular.get(word[:-1], 0) + count
+                    merged_plurals[key] = key_singular
+                    del d[key]
+    fused_cases = {}
+    standard_cases = {}
+    for word_lower, case_dict in d.items():
+        first = max(case_dict.items(), key=itemgetter(1))[0]
+        fused_cases[first] = sum(case_dict.values())
+        standard_cases[word_lower] = first
+    for plural, singular in merged_plurals.items():
+        standard_cases[plural] = standard_cases[singular]
+    return fused_cases, standard_cases
+
+
+class TermCounts:
+    """Mergeable raw counts: non-stopword unigrams and bigrams of non-stopwords."""
+
+    def __init__(self):
+        self.unigrams = Counter()
+        self.bigrams = Counter()
+
+    def update(self, texts, stopwords=RECALL_STOPWORDS):
+        stop = {w.lower() for w in stopwords}
+        for text in texts:
+            words = tokenize(text)
+            keep = [w.lower() not in stop for w in words]
+            self.unigrams.update(w for w, k in zip(words, keep) if k)
+            self.bigrams.update(f"{a} {b}" for a, b, ka, kb in zip(words, words[1:], keep, keep[1:]) if ka and kb)
+        return self
+
+    def merge(self, other):
+        self.unigrams.update(other.unigrams)
+        self.bigrams.update(other.bigrams)
+        return self
+
+    def subtract(self, other):
+        """Undo merge(other); terms whose count drops to zero are removed."""
+        for mine, theirs in [(self.unigrams, other.unigrams), (self.bigrams, other.bigrams)]:
+            mine.subtract(theirs)
+            for term in [t for t, count in mine.items() if count <= 0]:
+                del mine[term]
+        return self
+
+    def to_frame(self):
+        """One row per term: term, count and whether it is a bigram (for Parquet)."""
+        return pd.DataFrame({
+            "term": list(self.unigrams) + list(self.bigrams),
+            "count": list(self.unigrams.values()) + list(self.bigrams.values()),
+            "bigram": [False] * len(self.unigrams) + [True] * len(self.bigrams),
+        }).astype({"term": str, "count": "int64", "bigram": bool})
+
+    @classmethod
+    def from_frame(cls, df):
+        counts = cls()
+        for target, rows in [(counts.unigrams, df[~df["bigram"]]), (counts.bigrams, df[df["bigram"]])]:
+            target.update(dict(zip(rows["term"].tolist(), rows["count"].tolist())))
+        return counts
+
+    def frequencies(self, normalize_plurals=True, collocation_threshold=30):
+        """{term: count} like WordCloud(collocations=True).process_text."""
+        n_words = sum(self.unigrams.values())
+        counts_unigrams, standard_form = _fuse(self.unigrams, normalize_plurals)
+        counts_bigrams, _ = _fuse(self.bigrams, normalize_plurals)
+        orig_counts = counts_unigrams.copy()
+        for bigram_string, count in counts_bigrams.items():
+            first, second = bigram_string.split(" ")
+            word1 = standard_form[first.lower()]
+            word2 = standard_form[second.lower()]
+            if _collocation_score(count, orig_counts[word1], orig_counts[word2], n_words) > collocation_threshold:
+                counts_unigrams[word1] -= count
+                counts_unigrams[word2] -= count
+                counts_unigrams[bigram_string] = count
+        return {word: count for word, count in counts_unigrams.items() if count > 0}
+
+
+def count_terms(texts, stopwords=RECALL_STOPWORDS):
+    return TermCounts().update(texts, stopwords)
+
+
+def recall_campaigns(df):
+    """NHTSA ID and SUMMARY of each campaign once (first-seen order), as plain strings."""
+    docs = df[["NHTSA ID", "SUMMARY"]].dropna(subset=["SUMMARY"]).drop_duplicates()
+    return docs.astype(str).reset_index(drop=True)
+
+
+def recall_summaries(df):
+    """Each campaign's SUMMARY once, instead of once per make/model/year row."""
+    return recall_campaigns(df)["SUMMARY"].tolist()
+
+
+def count_summaries(summaries, stopwords=RECALL_STOPWORDS, max_workers=None, chunk_size=CHUNK_SIZE, pool=None):
+    """
+    TermCounts of `summaries`, counted in chunks across a process pool
+    (max_workers=1 counts in this process). Pass `pool` to reuse an open
+    ProcessPoolExecutor across calls. Like preprocess_recall_data, the
+    calling script needs an `if __name__ == "__main__"` guard.
+    """
+    chunks = [summaries[i:i + chunk_size] for i in range(0, len(summaries), chunk_size)]
+    max_workers = max_workers or min(len(chunks), os.cpu_count() or 1)
+    total = TermCounts()
+    if pool is None and max_workers <= 1:
+        for chunk in chunks:
+            total.merge(count_terms(chunk, stopwords))
+        return total
+    if pool is None:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            return count_summaries(summaries, stopwords, chunk_size=chunk_size, pool=pool)
+    # results come back in chunk order, so merged counts are deterministic
+    for part in pool.map(partial(count_terms, stopwords=stopwords), chunks):
+        total.merge(part)
+    return total
+
+if __name__ == "__main__":
+    # scaling benchmark on synthetic summaries
+    import random
+
+    rng = random.Random(0)
+    vocab = [f"{w}{s}" for w in ["fuel", "pump", "air", "bag", "brake", "steering", "wire", "seat",
+                                 "belt", "engine", "fire", "crash", "inflator", "leak", "latch"]
+             for s in ["", "s", "ing"]] + ["the", "and", "may", "could", "vehicle", "2019", "Ford's"]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    summaries = [" ".join(rng.choices(vocab, k=60)) for _ in range(n)]
+    baseline = None
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        freqs = count_summaries(summaries, max_workers=workers).frequencies()
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>3} workers: {elapsed:6.2f}s ({n / elapsed:,.0f} summaries/s, "
+              f"{baseline / elapsed:.1f}x), {len(freqs)} terms")
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
+
+from disk_cache import CACHE_DIR, read_cached, source_key, write_cached
+from preprocess import clean_recall_file, recall_files
+from term_frequencies import RECALL_STOPWORDS, TermCounts, count_summaries, recall_summaries
+
+"""
+Persistent term counts for the recall wordcloud (viz4).
+
+The raw counts (TermCounts) of every recall CSV are stored on their own in
+data/cache/term_counts/files/, next to the merged counts of all of them.
+update_term_store compares the CSVs in data/recall with the ones already
+merged: a new file is cleaned and counted on its own and added to the
+total, a removed file has its stored counts subtracted (a changed file is
+both). The final frequencies are cached too, so while no file changes the
+wordcloud reads one small Parquet file instead of the recall text.
+
+Campaigns are deduplicated within a file, so a campaign that appears in
+two files is counted twice.
+"""
+
+TERM_STORE_DIR = os.path.join(CACHE_DIR, "term_counts")
+# bump when the counting changes so stored counts are rebuilt
+TERM_STORE_VERSION = 1
+
+
+def store_key(stopwords=RECALL_STOPWORDS):
+    """Counts depend on the counting code and the stopwords, not only on the source files."""
+    digest = hashlib.sha1("\n".join(sorted({w.lower() for w in stopwords})).encode()).hexdigest()
+    return {"version": TERM_STORE_VERSION, "stopwords": digest}
+
+
+def _file_counts_path(store_dir, path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(store_dir, "files", name + ".parquet")
+
+
+def _read_counts(cache_path, key):
+    hit = read_cached(cache_path, key)
+    return None if hit is None else TermCounts.from_frame(hit[0])
+
+
+def file_term_counts(path, stopwords=RECALL_STOPWORDS, pool=None):
+    """TermCounts of one recall CSV, each campaign's summary counted once (see count_summaries)."""
+    df, _ = clean_recall_file(path)
+    return count_summaries(recall_summaries(df), stopwords, pool=pool)
+
+
+def _current_files(recall_path):
+    current = {}
+    for path in recall_files(recall_path):
+        file_key = source_key(path)
+        current[file_key["path"]] = file_key
+    return current
+
+
+def update_term_store(recall_path="data/recall", store_dir=TERM_STORE_DIR, stopwords=RECALL_STOPWORDS):
+    """
+    Merged TermCounts of every recall CSV in `recall_path`. Only files that
+    were added, changed or removed since the last call are processed.
+    """
+    key = store_key(stopwords)
+    merged_path = os.path.join(store_dir, "merged.parquet")
+    hit = read_cached(merged_path, key)
+    total, merged = (TermCounts.from_frame(hit[0]), hit[1]["files"]) if hit is not None else (TermCounts(), {})
+
+    current = _current_files(recall_path)
+    removed = [path for path, file_key in merged.items() if current.get(path) != file_key]
+    added = [path for path, file_key in current.items() if merged.get(path) != file_key]
+    if not (removed or added):
+        return total
+
+    start = time.perf_counter()
+    for path in removed:
+        counts = _read_counts(_file_counts_path(store_dir, path), dict(merged[path], **key))
+        if counts is None:
+            # the counts to subtract are gone: re-merge from the per-file counts that are left
+            total, merged, added = TermCounts(), {}, list(current)
+            break
+        total.subtract(counts)
+        del merged[path]
+    # one pool for all the files to count; workers only start once a file needs them
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        for path in added:
+            counts_path = _file_counts_path(store_dir, path)
+            file_key = dict(current[path], **key)
+            counts = _read_counts(counts_path, file_key)
+            if counts is None:
+                counts = file_term_counts(path, stopwords, pool)
+                write_cached(counts_path, counts.to_frame(), file_key)
+            total.merge(counts)
+            merged[path] = current[path]
+    write_cached(merged_path, total.to_frame(), key, {"files": merged})
+    print(f"Term store: {len(added)} file(s) added, {len(removed)} removed "
+          f"in {time.perf_counter() - start:.1f}s")
+    return total
+
+
+def term_store_frequencies(recall_path="data/recall", store_dir=TERM_STORE_DIR, stopwords=RECALL_STOPWORDS):
+    """
+    The wordcloud's {term: count} for every recall CSV in `recall_path`.
+    Collocations are scored on the merged counts, so the result is cached
+    for the current set of files and recomputed after any of them changes.
+    """
+    key = dict(store_key(stopwords), files=_current_files(recall_path))
+    frequencies_path = os.path.join(store_dir, "frequencies.parquet")
+    hit = read_cached(frequencies_path, key)
+    if hit is not None:
+        return dict(zip(hit[0]["term"].tolist(), hit[0]["count"].tolist()))
+    frequencies = update_term_store(recall_path, store_dir, stopwords).frequencies()
+    df = pd.DataFrame({"term": list(frequencies), "count": list(frequencies.values())})
+    write_cached(frequencies_path, df.astype({"term": str, "count": "int64"}), key)
+    return frequencies
+
+
+if __name__ == "__main__":
+    # build or update the store, then time an unchanged read
+    recall_path = sys.argv[1] if len(sys.argv) > 1 else "data/recall"
+    term_store_frequencies(recall_path)
+    start = time.perf_counter()
+    frequencies = term_store_frequencies(recall_path)
+    print(f"frequencies read in {(time.perf_counter() - start) * 1000:.0f} ms, {len(frequencies):,} terms")
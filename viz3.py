@@ -1,44 +1,136 @@
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+import plotly.io as pio
 from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 
-from preprocess import preprocess_recall_data
+from artifacts import map_artifact
+from packed_arrays import JS_UNPACK, pack, pack_uint
+from preprocess import preprocess_recall_data, recall_files, recall_year_counts
 
 
 # ---------- Load & preprocess recall data ----------
 
 RECALL_PATH = "data/recall"  # adjust if needed
-df = preprocess_recall_data(RECALL_PATH)
-
-# Clean MODEL YEAR
-df = df.dropna(subset=["MODEL YEAR"])
-df["MODEL YEAR"] = df["MODEL YEAR"].astype(int)
-
-ALL_MAKES = sorted(df["MAKE"].dropna().unique())
+RECALL_TABLES = ["make_model_year", "make_year", "model_year", "make_campaigns"]
+
+def load_recall_counts(recall_path=RECALL_PATH):
+    """
+    The small campaign-count tables viz3 runs on (see recall_year_counts).
+    They are memory-mapped from the artifacts prebuilt by build_artifacts.py
+    when those are up to date, otherwise built from the raw recall CSVs.
+    """
+    sources = recall_files(recall_path)
+    tables = {name: map_artifact("recall_" + name, sources) for name in RECALL_TABLES}
+    if any(t is None for t in tables.values()):
+        # this runs at import time (also in gunicorn workers), where a process
+        # pool would re-import this module; build_artifacts.py builds in parallel
+        tables = recall_year_counts(preprocess_recall_data(recall_path, processes=False))
+    return tables
+
+RECALL_COUNTS = load_recall_counts()
+
+ALL_MAKES = sorted(RECALL_COUNTS["make_year"]["MAKE"].unique())
 DEFAULT_MAKE = "SUBARU" if "SUBARU" in ALL_MAKES else ALL_MAKES[0]
 
-# Precompute brand-year and model-year recall counts (distinct campaigns)
-BRAND_YEAR_COUNTS = (
-    df.groupby(["MAKE", "MODEL YEAR"])["NHTSA ID"]
-    .nunique()
-    .reset_index()
+# brand-year and model-year recall counts (distinct campaigns)
+BRAND_YEAR_COUNTS = RECALL_COUNTS["make_year"]
+MODEL_YEAR_COUNTS = RECALL_COUNTS["model_year"]
+
+def dense_year_series(counts):
+    """
+    Turn a count Series indexed by (*key, MODEL YEAR) into
+    {key: (first_year, counts for every year up to the last one, 0 = no recalls)}.
+    """
+    keys = counts.index.droplevel(-1)
+    years = counts.index.get_level_values(-1).to_numpy(dtype=np.int64)
+    values = counts.to_numpy(dtype=np.int64)
+    # groupby output is sorted by key, so each key is one contiguous run
+    codes, uniques = pd.factorize(keys)
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    series = {}
+    for key, y, v in zip(uniques, np.split(years, bounds), np.split(values, bounds)):
+        dense = np.zeros(y[-1] - y[0] + 1, dtype=np.int64)
+        dense[y - y[0]] = v
+        series[key] = (int(y[0]), dense)
+    return series
+
+# Index built once at startup so callbacks are dictionary lookups:
+#   MODELS_BY_MAKE[make] -> sorted model names
+#   YEAR_SERIES[(make, model or "ALL_MODELS")] -> (first_year, distinct campaigns per year)
+_make_model_counts = RECALL_COUNTS["make_model_year"].set_index(["MAKE", "MODEL", "MODEL YEAR"])["NHTSA ID"]
+YEAR_SERIES = dense_year_series(_make_model_counts)
+MODELS_BY_MAKE = {}
+for _make, _model in YEAR_SERIES:
+    MODELS_BY_MAKE.setdefault(_make, []).append(_model)
+MODELS_BY_MAKE = {make: sorted(models) for make, models in MODELS_BY_MAKE.items()}
+YEAR_SERIES.update(
+    ((make, "ALL_MODELS"), s)
+    for make, s in dense_year_series(BRAND_YEAR_COUNTS.set_index(["MAKE", "MODEL YEAR"])["NHTSA ID"]).items()
 )
 
-MODEL_YEAR_COUNTS = (
-    df.groupby(["MODEL", "MODEL YEAR"])["NHTSA ID"]
-    .nunique()
-    .reset_index()
-)
+class YearDistribution:
+    """
+    Per-year sorted recall counts (one entry per brand or model), stored flat
+    as year * STRIDE + count so one searchsorted answers every year of a series.
+    """
+    STRIDE = 1 << 32
+
+    def __init__(self, counts_df):
+        years = counts_df["MODEL YEAR"].to_numpy(dtype=np.int64)
+        counts = counts_df["NHTSA ID"].to_numpy(dtype=np.int64)
+        self.keys = np.sort(years * self.STRIDE + counts)
+        self.first_year = int(years.min()) if len(years) else 0
+        n_years = int(years.max()) - self.first_year + 1 if len(years) else 0
+        # where each year's block starts in self.keys, and how long it is
+        self.sizes = np.bincount(years - self.first_year, minlength=n_years)
+        self.starts = np.concatenate([[0], np.cumsum(self.sizes)[:-1]]).astype(np.int64)
+
+    def percentiles(self, years, counts):
+        """(share of entries <= count in 100s, number of entries) for each year."""
+        years = np.asarray(years, dtype=np.int64)
+        idx = years - self.first_year
+        inside = (idx >= 0) & (idx < len(self.sizes))
+        idx = np.where(inside, idx, 0)
+        sizes = np.where(inside, self.sizes[idx], 0)
+        below = np.searchsorted(self.keys, years * self.STRIDE + np.asarray(counts, dtype=np.int64), side="right")
+        below = below - self.starts[idx]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = 100.0 * below / sizes
+        return pct, sizes
+
+BRAND_DISTRIBUTION = YearDistribution(BRAND_YEAR_COUNTS)
+MODEL_DISTRIBUTION = YearDistribution(MODEL_YEAR_COUNTS)
+
+def percentile_labels(distribution, years, counts, min_entries):
+    """Hover strings like '42.0%', or 'N/A' when a year has fewer than min_entries entries."""
+    pct, sizes = distribution.percentiles(years, counts)
+    return [f"{p:.1f}%" if n >= min_entries else "N/A" for p, n in zip(pct.tolist(), sizes.tolist())]
+
+def hover_percentiles(model, years, counts):
+    """(hover percentile per year, hover prefix) for a make's "All models" series or one model."""
+    if model == "ALL_MODELS":
+        # percentile across brands for that year
+        return (percentile_labels(BRAND_DISTRIBUTION, years, counts, min_entries=1),
+                "Percentile (across brands):")
+    # percentile across models for that year (only if more than 4 models)
+    return (percentile_labels(MODEL_DISTRIBUTION, years, counts, min_entries=5),
+            "Percentile (across models):")
 
 def build_figure(make: str, model: str):
     """Build the Plotly figure for a given make + model (or all models)."""
-    df_brand = df[df["MAKE"] == make]
-
-    if model != "ALL_MODELS":
-        df_brand = df_brand[df_brand["MODEL"] == model]
+    entry = YEAR_SERIES.get((make, model))
 
-    if df_brand.empty:
+    if entry is None:
         fig = go.Figure()
         fig.update_layout(
             title=f"No data for {make}" + ("" if model == "ALL_MODELS" else f" – {model}"),
@@ -46,46 +138,12 @@ def build_figure(make: str, model: str):
         )
         return fig
 
-    # Count distinct recall campaigns per model year for the selected series
-    grouped = df_brand.groupby("MODEL YEAR")["NHTSA ID"].nunique()
-
-    # Continuous year range
-    min_year = int(df_brand["MODEL YEAR"].min())
-    max_year = int(df_brand["MODEL YEAR"].max())
-    all_years = list(range(min_year, max_year + 1))
-
-    grouped_full = grouped.reindex(all_years, fill_value=0)
-
-    years = grouped_full.index.to_list()
-    counts = grouped_full.values
+    # Distinct recall campaigns per model year over a continuous year range
+    first_year, counts = entry
+    years = list(range(first_year, first_year + len(counts)))
 
     # ---- Percentile computation for hover ----
-    percentile_strings = []
-
-    if model == "ALL_MODELS":
-        # percentile across brands for that year
-        for y, c in zip(years, counts):
-            dist = BRAND_YEAR_COUNTS.loc[
-                BRAND_YEAR_COUNTS["MODEL YEAR"] == y, "NHTSA ID"
-            ].values
-            if len(dist) == 0:
-                percentile_strings.append("N/A")
-            else:
-                pct = 100.0 * (dist <= c).sum() / len(dist)
-                percentile_strings.append(f"{pct:.1f}%")
-        percentile_prefix = "Percentile (across brands):"
-    else:
-        # percentile across models for that year
-        for y, c in zip(years, counts):
-            dist = MODEL_YEAR_COUNTS.loc[
-                MODEL_YEAR_COUNTS["MODEL YEAR"] == y, "NHTSA ID"
-            ].values
-            if len(dist) <= 4:  # only if more than 4 models
-                percentile_strings.append("N/A")
-            else:
-                pct = 100.0 * (dist <= c).sum() / len(dist)
-                percentile_strings.append(f"{pct:.1f}%")
-        percentile_prefix = "Percentile (across models):"
+    percentile_strings, percentile_prefix = hover_percentiles(model, years, counts)
 
     # Year formatter (your logic)
     def format_year(year: int) -> str:
@@ -136,9 +194,206 @@ def build_figure(make: str, model: str):
     )
     return fig
 
+# ---------- Figure cache ----------
+
+FIGURE_CACHE_SIZE = 256   # max (make, model) figures kept
+WARM_TOP_MAKES = 20       # pre-build "All models" for the most-recalled makes at startup (0 = off)
+# ship all the data to the browser once and update in clientside callbacks
+# (python viz3.py --client-side, or VIZ3_CLIENT_SIDE=1 under gunicorn)
+CLIENT_SIDE = "--client-side" in sys.argv or os.environ.get("VIZ3_CLIENT_SIDE") == "1"
+
+class FigureCache:
+    """
+    Bounded LRU cache of build_figure results keyed on (make, model).
+
+    Figures are stored as their JSON string, so a hit skips building and
+    validating the Plotly figure and cached entries can't be mutated.
+    """
+
+    def __init__(self, build, maxsize=FIGURE_CACHE_SIZE):
+        self.build = build
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_json(self, make, model):
+        key = (make, model)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        fig_json = self.build(make, model).to_json()
+        with self.lock:
+            self.entries[key] = fig_json
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return fig_json
+
+    def get(self, make, model):
+        """Figure as a fresh dict, ready to return from a callback."""
+        return json.loads(self.get_json(make, model))
+
+    def warm(self, keys):
+        for make, model in keys:
+            self.get_json(make, model)
+        # warm-up builds don't count as misses
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+FIGURE_CACHE = FigureCache(build_figure)
+if WARM_TOP_MAKES and not CLIENT_SIDE:
+    _top_makes = (
+        RECALL_COUNTS["make_campaigns"].set_index("MAKE")["NHTSA ID"]
+        .sort_values(ascending=False).head(WARM_TOP_MAKES).index
+    )
+    FIGURE_CACHE.warm((make, "ALL_MODELS") for make in _top_makes)
+
+# ---------- Client-side mode ----------
+
+def client_payload():
+    """
+    Every series and hover percentile in one compact dict for dcc.Store.
+
+    makes[i] owns models[model_start[i]:model_start[i + 1]]. Series
+    s = i + model_start[i] + k is make i's "All models" (k = 0) or its model
+    k - 1: counts[count_start[s]:count_start[s + 1]] for the years from
+    year0[s] on, with pct the hover percentile in tenths of a percent
+    (-1 = N/A). The number arrays are packed as base64 typed arrays.
+    """
+    models, model_start = [], [0]
+    year0, count_start, counts, pct = [], [0], [], []
+    for make in ALL_MAKES:
+        make_models = MODELS_BY_MAKE.get(make, [])
+        models += make_models
+        model_start.append(len(models))
+        for model in ["ALL_MODELS"] + make_models:
+            first_year, series = YEAR_SERIES[(make, model)]
+            labels, _ = hover_percentiles(model, range(first_year, first_year + len(series)), series)
+            year0.append(first_year)
+            count_start.append(count_start[-1] + len(series))
+            counts.append(series)
+            pct += [-1 if label == "N/A" else round(float(label[:-1]) * 10) for label in labels]
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+    packed_counts, count_bytes = pack_uint(counts)
+    return {
+        "makes": ALL_MAKES,
+        "models": models,
+        "model_start": pack(model_start, "<i4"),
+        "year0": pack(year0, "<i2"),
+        "count_start": pack(count_start, "<i4"),
+        "counts": packed_counts,
+        "count_bytes": count_bytes,
+        "pct": pack(pct, "<i2"),
+        "template": pio.templates["plotly_white"].to_plotly_json(),
+    }
+
+def payload_size(payload):
+    """(bytes, gzipped bytes) of the payload as sent to the browser."""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return len(raw), len(gzip.compress(raw))
+
+# decoded payload is kept per store object, shared by both callbacks
+_JS_DECODE = """
+    window.viz3Decoded = window.viz3Decoded || new WeakMap();
+""" + JS_UNPACK + """
+    function decode(data) {
+        let d = window.viz3Decoded.get(data);
+        if (!d) {
+            d = {
+                makeIndex: new Map(data.makes.map((m, i) => [m, i])),
+                modelStart: unpack(data.model_start, Int32Array),
+                year0: unpack(data.year0, Int16Array),
+                countStart: unpack(data.count_start, Int32Array),
+                counts: unpack(data.counts, UINT[data.count_bytes]),
+                pct: unpack(data.pct, Int16Array),
+            };
+            window.viz3Decoded.set(data, d);
+        }
+        return d;
+    }
+"""
+
+# same options as update_model_options
+JS_MODEL_OPTIONS = """(function () {""" + _JS_DECODE + """
+    return function (make, data) {
+        const d = decode(data);
+        const i = d.makeIndex.get(make);
+        const models = i === undefined ? [] : data.models.slice(d.modelStart[i], d.modelStart[i + 1]);
+        return [[{label: "All models", value: "ALL_MODELS"}].concat(models.map(m => ({label: m, value: m}))),
+                "ALL_MODELS"];
+    };
+})()"""
+
+# same figure as build_figure
+JS_FIGURE = """(function () {""" + _JS_DECODE + """
+    return function (make, model, data) {
+        const d = decode(data);
+        const i = d.makeIndex.get(make);
+        let k = -1;
+        if (i !== undefined) {
+            k = model === "ALL_MODELS" ? 0
+                : data.models.slice(d.modelStart[i], d.modelStart[i + 1]).indexOf(model) + 1 || -1;
+        }
+        const titleSuffix = model === "ALL_MODELS" ? "" : " \u2013 " + model;
+        if (k < 0) {
+            return {data: [], layout: {title: {text: "No data for " + make + titleSuffix}, template: data.template}};
+        }
+        const s = i + d.modelStart[i] + k;
+        const years = [], counts = [], labels = [], ticktext = [];
+        for (let j = d.countStart[s]; j < d.countStart[s + 1]; j++) {
+            const year = d.year0[s] + j - d.countStart[s];
+            const yy = String(year % 100).padStart(2, "0");
+            years.push(year);
+            counts.push(d.counts[j]);
+            labels.push(d.pct[j] < 0 ? "N/A" : (d.pct[j] / 10).toFixed(1) + "%");
+            ticktext.push(Math.floor(year / 100) === 19 ? "'" + yy : yy);
+        }
+        const prefix = k === 0 ? "Percentile (across brands):" : "Percentile (across models):";
+        return {
+            data: [{
+                type: "scatter",
+                x: years,
+                y: counts,
+                mode: "lines+markers",
+                name: "Distinct recall campaigns",
+                customdata: labels,
+                hovertemplate: "Model Year: %{x}<br>Recalls: %{y}<br>" + prefix + " %{customdata}<br><extra></extra>",
+            }],
+            layout: {
+                title: {text: "Recall Trends for " + make + titleSuffix + " (by Model Year)"},
+                xaxis: {title: {text: "Model Year"}, tickmode: "array", tickvals: years, ticktext: ticktext},
+                yaxis: {title: {text: "Number of distinct recalls"}, dtick: 1},
+                template: data.template,
+                margin: {l: 60, r: 20, t: 60, b: 60},
+            },
+        };
+    };
+})()"""
+
+if CLIENT_SIDE:
+    CLIENT_PAYLOAD = client_payload()
+    _raw, _gz = payload_size(CLIENT_PAYLOAD)
+    print(f"Client-side payload: {_raw / 1024:.0f} KB ({_gz / 1024:.0f} KB gzipped), "
+          f"{len(ALL_MAKES)} makes, {len(CLIENT_PAYLOAD['models'])} models")
+
 # ---------- Dash app (GPT helped me make the html layout) ----------
 
 app = Dash(__name__)
+server = app.server  # for gunicorn: gunicorn viz3:server
 
 app.layout = html.Div(
     style={"fontFamily": "sans-serif", "maxWidth": "900px", "margin": "0 auto", "padding": "20px"},
@@ -176,37 +431,75 @@ app.layout = html.Div(
         ),
 
         dcc.Graph(id="recall-graph"),
-    ],
+    ] + ([dcc.Store(id="recall-data", data=CLIENT_PAYLOAD)] if CLIENT_SIDE else []),
 )
 
 # ---------- Callbacks ----------
 
-@app.callback(
-    Output("model-dropdown", "options"),
-    Output("model-dropdown", "value"),
-    Input("make-dropdown", "value"),
-)
 def update_model_options(selected_make):
-    df_brand = df[df["MAKE"] == selected_make]
-
-    if df_brand.empty:
-        options = [{"label": "All models", "value": "ALL_MODELS"}]
-        return options, "ALL_MODELS"
-
-    models = sorted(df_brand["MODEL"].dropna().unique())
+    models = MODELS_BY_MAKE.get(selected_make, [])
     options = [{"label": "All models", "value": "ALL_MODELS"}] + [
         {"label": m, "value": m} for m in models
     ]
     return options, "ALL_MODELS"
 
-@app.callback(
+def update_graph(selected_make, selected_model):
+    return FIGURE_CACHE.get(selected_make, selected_model)
+
+_model_options_io = (
+    Output("model-dropdown", "options"),
+    Output("model-dropdown", "value"),
+    Input("make-dropdown", "value"),
+)
+_graph_io = (
     Output("recall-graph", "figure"),
     Input("make-dropdown", "value"),
     Input("model-dropdown", "value"),
 )
-def update_graph(selected_make, selected_model):
-    return build_figure(selected_make, selected_model)
+if CLIENT_SIDE:
+    # run in the browser on the stored payload; no server round trips
+    app.clientside_callback(JS_MODEL_OPTIONS, *_model_options_io, State("recall-data", "data"))
+    app.clientside_callback(JS_FIGURE, *_graph_io, State("recall-data", "data"))
+else:
+    app.callback(*_model_options_io)(update_model_options)
+    app.callback(*_graph_io)(update_graph)
+
+@app.server.route("/figure-cache-stats")
+def figure_cache_stats():
+    return FIGURE_CACHE.stats()
+
+
+def _latency_summary(label, times):
+    times = np.array(times) * 1000
+    print(f"{label}: {len(times)} calls, mean {times.mean():.2f} ms, "
+          f"p50 {np.percentile(times, 50):.2f} ms, p99 {np.percentile(times, 99):.2f} ms")
+
+def benchmark_build_figure(n_requests=2000, seed=0):
+    """Time build_figure for every make/model, then update_graph under a skewed load."""
+    calls = [(make, "ALL_MODELS") for make in ALL_MAKES]
+    calls += [(make, model) for make in ALL_MAKES for model in MODELS_BY_MAKE.get(make, [])]
+    times = []
+    for make, model in calls:
+        start = time.perf_counter()
+        build_figure(make, model)
+        times.append(time.perf_counter() - start)
+    _latency_summary("build_figure (uncached)", times)
+
+    # a few popular selections get most of the traffic (Zipf-like)
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(calls) + 1)
+    picks = rng.choice(len(calls), size=n_requests, p=weights / weights.sum())
+    times = []
+    for i in picks:
+        start = time.perf_counter()
+        update_graph(*calls[i])
+        times.append(time.perf_counter() - start)
+    _latency_summary("update_graph (cached)", times)
+    print(FIGURE_CACHE.stats())
 
 
 if __name__ == "__main__":
-    app.run(debug=False, port=8050)
+    if "--benchmark" in sys.argv:
+        benchmark_build_figure()
+    else:
+        app.run(debug=False, port=8050)
@@ -1,5 +1,6 @@
 import matplotlib.pyplot as plt
 import os
+import sys
 import mplcursors
 
 from PyQt6.QtWidgets import (
@@ -15,65 +16,51 @@ import plotly.graph_objects as go
 
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from wordcloud import WordCloud, STOPWORDS
-import spacy
+from wordcloud import WordCloud
 import pandas as pd
 from preprocess import preprocess_recall_data
-
-# Make sure you've run:
-#   pip install spacy
-#   python -m spacy download en_core_web_sm
-try:
-    nlp = spacy.load("en_core_web_sm")
-    # increase the size of the wordcloud
-    # nlp.max_length = 70538817
-except OSError as e:
-    raise OSError(
-        "spaCy model 'en_core_web_sm' not found. "
-        "Install it with: python -m spacy download en_core_web_sm"
-    ) from e
+from term_frequencies import RECALL_STOPWORDS, count_summaries, recall_campaigns
+from term_store import term_store_frequencies
 
 # ---------- Viz 4: Recall wordcloud ----------
 
 # uses datasource 4 (recall data)
-def viz4(df):
+def viz4(df=None, lemmatize=False, frequencies=None):
     """
     Visualization 4: Wordcloud of recall SUMMARY text.
 
     Takes the preprocessed recall dataframe (with SUMMARY column),
     builds a wordcloud, and saves it to output/recall_wordcloud.png.
+    With lemmatize=True, words are counted by their spaCy lemma
+    ("fires" -> "fire"), see lemmas.py. Pass already counted terms as
+    `frequencies` (e.g. from term_store.term_store_frequencies) instead of df.
     """
 
-    # Combine all summaries into one big string
-    summaries = df["SUMMARY"].dropna().astype(str)
-    if summaries.empty:
-        print("No SUMMARY text available for wordcloud.")
+    if frequencies is None:
+        # Each campaign's summary once, counted in chunks across a process pool
+        campaigns = recall_campaigns(df)
+        if campaigns.empty:
+            print("No SUMMARY text available for wordcloud.")
+            return
+        if lemmatize:
+            from lemmas import recall_lemmas
+            summaries = recall_lemmas(campaigns)
+        else:
+            summaries = campaigns["SUMMARY"].tolist()
+        frequencies = count_summaries(summaries).frequencies()
+
+    if not frequencies:
+        print("No terms left for wordcloud.")
         return
 
-    full_text = " ".join(summaries.tolist())
-
-    # Base stopwords + some recall-specific ones to avoid boring words
-    stopwords = set(STOPWORDS)
-    extra_stops = {
-        "recall", "vehicle", "vehicles", "honda", "acura", "toyota", "ford",
-        "customer", "service", "team", "contacting", "urgent", "safety",
-        "please", "may", "could", "cause", "affected", "owners", "owner",
-        "dealers", "dealer", "free", "charge", "repair", "repairs",
-        # "notice", "followup", "follow", "bulletin", "information", "additional",
-        # "part", "parts", "system", "systems", "may", "will", "also", "one",
-        # "two", "use", "used", "using", "within", "without", "including",
-        # "ensure", "ensure", "check", "checks", "checking"
-    }
-    stopwords |= extra_stops
-
-    # Generate wordcloud
+    # Generate wordcloud (RECALL_STOPWORDS were already removed while counting)
     wc = WordCloud(
         width=1600,
         height=800,
         background_color="white",
-        stopwords=stopwords,
+        stopwords=RECALL_STOPWORDS,
         collocations=True  # keep common two-word phrases
-    ).generate(full_text)
+    ).generate_from_frequencies(frequencies)
 
     # Plot and save
     plt.figure(figsize=(14, 7))
@@ -96,5 +83,9 @@ if __name__ == "__main__":
     
 
     recall_path = "data/recall"
-    recall_df = preprocess_recall_data(recall_path)
-    viz4(recall_df)
\ No newline at end of file
+    if "--lemmas" in sys.argv:
+        recall_df = preprocess_recall_data(recall_path)
+        viz4(recall_df, lemmatize=True)
+    else:
+        # only recall files added or changed since the last run are counted
+        viz4(frequencies=term_store_frequencies(recall_path))
\ No newline at end of file
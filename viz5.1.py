@@ -1,34 +1,21 @@
 import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
-from scipy import stats
+
+from safety_ratings import SAFETY_RATINGS_PATH, load_safety_ratings, weight_rollover_rows
+from streaming_stats import summarize_csv, summarize_frame
 
 """
 Rollover rating vs weight
 """
 
-df = pd.read_csv('data/safety_ratings.csv', low_memory=False)
-
 def prepare_weight_safety_data():
-    df_clean = df.copy()
-    df_clean['MODEL_YR'] = pd.to_numeric(df_clean['MODEL_YR'], errors='coerce')
-    df_clean['ROLLOVER_STARS'] = pd.to_numeric(df_clean['ROLLOVER_STARS'], errors='coerce')
-    df_clean['OVERALL_STARS'] = pd.to_numeric(df_clean['OVERALL_STARS'], errors='coerce')
-    df_clean['CURB_WEIGHT'] = pd.to_numeric(df_clean['CURB_WEIGHT'], errors='coerce')
-    df_clean['MIN_GROSS_WEIGHT'] = pd.to_numeric(df_clean['MIN_GROSS_WEIGHT'], errors='coerce')
-    df_clean['WEIGHT_LBS'] = df_clean['CURB_WEIGHT'].combine_first(df_clean['MIN_GROSS_WEIGHT'])
-    df_clean['WEIGHT_TONS'] = df_clean['WEIGHT_LBS'] / 2000
-    df_clean = df_clean.dropna(subset=['WEIGHT_TONS', 'ROLLOVER_STARS', 'MAKE', 'MODEL'])
-    df_clean = df_clean[(df_clean['WEIGHT_TONS'] > 0.5) & (df_clean['WEIGHT_TONS'] < 10)]
-    df_clean = df_clean[(df_clean['ROLLOVER_STARS'] >= 0) & (df_clean['ROLLOVER_STARS'] <= 5)]
-    return df_clean
+    return weight_rollover_rows(load_safety_ratings())
 
-def create_weight_safety_visualization():
-    df_clean = prepare_weight_safety_data()
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
+def vehicle_trace(df_clean, webgl=False):
+    """One marker per vehicle, colored by overall stars (WebGL for large views)."""
+    scatter = go.Scattergl if webgl else go.Scatter
+    return scatter(
         x=df_clean['WEIGHT_TONS'],
         y=df_clean['ROLLOVER_STARS'],
         mode='markers',
@@ -42,7 +29,7 @@ def create_weight_safety_visualization():
             opacity=0.2,
             line=dict(width=1, color='white')
         ),
-        text=df_clean['MAKE'] + ' ' + df_clean['MODEL'] + ' (' + df_clean['MODEL_YR'].astype(str) + ')',
+        text=df_clean['MAKE'].astype(str) + ' ' + df_clean['MODEL'].astype(str) + ' (' + df_clean['MODEL_YR'].astype(str) + ')',
         hovertemplate=(
             "<b>%{text}</b><br>"
             "Weight: %{x:.1f} tons<br>"
@@ -50,17 +37,26 @@ def create_weight_safety_visualization():
             "Overall Rating: %{marker.color:.1f}<br>"
             "<extra></extra>"
         )
-    ))
-    
-    x = df_clean['WEIGHT_TONS'].values
-    y = df_clean['ROLLOVER_STARS'].values
+    )
+
+def summary_traces(df_clean=None, summary=None):
+    """
+    Trend line and per-weight-group averages. Returns (traces, r value or None).
+
+    Pass a precomputed `summary` (streaming_stats.summarize_csv) for inputs
+    too large to load; otherwise it is computed from df_clean.
+    """
+    traces = []
+    r_value = None
+    if summary is None:
+        summary = summarize_frame(df_clean)
     
-    if len(x) > 1:
-        slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
-        trend_x = np.linspace(x.min(), x.max(), 100)
+    if summary.fit is not None:
+        slope, intercept, r_value = summary.fit.slope, summary.fit.intercept, summary.fit.rvalue
+        trend_x = np.linspace(summary.x_min, summary.x_max, 100)
         trend_y = slope * trend_x + intercept
         
-        fig.add_trace(go.Scatter(
+        traces.append(go.Scatter(
             x=trend_x,
             y=trend_y,
             mode='lines',
@@ -69,24 +65,20 @@ def create_weight_safety_visualization():
             hovertemplate="Weight: %{x:.1f} tons<br>Predicted Rating: %{y:.2f}<br><extra></extra>"
         ))
     
-    weight_bins = pd.cut(df_clean['WEIGHT_TONS'], bins=5)
-    bin_means = df_clean.groupby(weight_bins)['ROLLOVER_STARS'].mean()
-    bin_counts = df_clean.groupby(weight_bins).size()
-    
     bin_centers = []
-    for bin_range in bin_means.index:
+    for bin_range in summary.intervals:
         left = bin_range.left
         right = bin_range.right
         bin_centers.append((left + right) / 2)
     
-    fig.add_trace(go.Scatter(
+    traces.append(go.Scatter(
         x=bin_centers,
-        y=bin_means.values,
+        y=summary.means,
         mode='markers+lines',
         name='Average by Weight Group',
         marker=dict(size=12, color='orange', symbol='diamond'),
         line=dict(color='orange', width=2),
-        text=[f"{count} vehicles" for count in bin_counts.values],
+        text=[f"{count} vehicles" for count in summary.counts],
         hovertemplate=(
             "Weight Group: %{x:.1f} tons<br>"
             "Average Rating: %{y:.2f}<br>"
@@ -94,7 +86,9 @@ def create_weight_safety_visualization():
             "<extra></extra>"
         )
     ))
-    
+    return traces, r_value
+
+def style_figure(fig, n_vehicles, r_value):
     fig.update_layout(
         title=dict(
             text='Vehicle Weight vs Rollover Safety Rating',
@@ -120,10 +114,10 @@ def create_weight_safety_visualization():
     fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
     fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
     
-    if len(x) > 1:
+    if r_value is not None:
         fig.add_annotation(
             # text=f"Correlation: r = {r_value:.3f}<br>p-value: {p_value:.4f}<br>N = {len(df_clean)} vehicles",
-            text=f"Correlation: r = {r_value:.3f}<br>N = {len(df_clean)} vehicles",
+            text=f"Correlation: r = {r_value:.3f}<br>N = {n_vehicles} vehicles",
             xref="paper", yref="paper",
             x=0.02, y=0.98,
             showarrow=False,
@@ -132,8 +126,188 @@ def create_weight_safety_visualization():
             bordercolor="black",
             borderwidth=1
         )
+    return fig
+
+def create_weight_safety_visualization():
+    df_clean = prepare_weight_safety_data()
+    
+    fig = go.Figure()
+    fig.add_trace(vehicle_trace(df_clean))
+    traces, r_value = summary_traces(df_clean)
+    fig.add_traces(traces)
+    style_figure(fig, len(df_clean), r_value)
     
     fig.show()
 
+def create_streamed_visualization(path=SAFETY_RATINGS_PATH):
+    """
+    Trend line and weight-group averages only, streamed from the CSV chunk
+    by chunk (python viz5.1.py --stream), for files too large to load.
+    """
+    summary = summarize_csv(path)
+    traces, r_value = summary_traces(summary=summary)
+    fig = go.Figure(traces)
+    style_figure(fig, int(summary.counts.sum()), r_value)
+
+    fig.show()
+
+# ---------- Level-of-detail mode (Dash) ----------
+# python viz5.1.py --dash: WebGL markers for the vehicles in view, or a grid
+# of binned markers (count + mean overall stars) while more than
+# LOD_MAX_POINTS are in view; zooming re-bins the view on the server.
+
+LOD_MAX_POINTS = 5000   # draw individual vehicles once at most this many are in view
+LOD_GRID = (80, 40)     # weight x rollover cells of the binned view
+
+class WeightPoints:
+    """The cleaned vehicles as plain arrays, so each view is a mask and a few bincounts."""
+
+    def __init__(self, df_clean):
+        self.df = df_clean
+        self.x = df_clean['WEIGHT_TONS'].to_numpy(dtype=np.float64)
+        self.y = df_clean['ROLLOVER_STARS'].to_numpy(dtype=np.float64)
+        self.color = df_clean['OVERALL_STARS'].to_numpy(dtype=np.float64)
+        self.full_x = [float(self.x.min()), float(self.x.max())] if len(self.x) else [0.0, 1.0]
+        self.full_y = [0.0, 5.5]
+
+    def in_view(self, x_range, y_range):
+        return ((self.x >= x_range[0]) & (self.x <= x_range[1])
+                & (self.y >= y_range[0]) & (self.y <= y_range[1]))
+
+    def binned_trace(self, mask, x_range, y_range, grid=LOD_GRID):
+        """Grid aggregation of the masked points: one marker per non-empty cell at the cell's mean position."""
+        nx, ny = grid
+        x, y, color = self.x[mask], self.y[mask], self.color[mask]
+        ix = np.clip(((x - x_range[0]) / max(x_range[1] - x_range[0], 1e-12) * nx).astype(np.int64), 0, nx - 1)
+        iy = np.clip(((y - y_range[0]) / max(y_range[1] - y_range[0], 1e-12) * ny).astype(np.int64), 0, ny - 1)
+        cell = ix * ny + iy
+        counts = np.bincount(cell, minlength=nx * ny)
+        rated = ~np.isnan(color)
+        color_sum = np.bincount(cell[rated], weights=color[rated], minlength=nx * ny)
+        color_n = np.bincount(cell[rated], minlength=nx * ny)
+        used = np.flatnonzero(counts)
+        n = counts[used]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_color = color_sum[used] / color_n[used]
+        return go.Scattergl(
+            x=np.bincount(cell, weights=x, minlength=nx * ny)[used] / n,
+            y=np.bincount(cell, weights=y, minlength=nx * ny)[used] / n,
+            mode='markers',
+            name='Vehicles (binned)',
+            marker=dict(
+                size=6 + 18 * np.sqrt(n / n.max()) if len(n) else 6,
+                color=mean_color,
+                colorscale='Viridis',
+                showscale=True,
+                colorbar=dict(title="Overall<br>Stars", x=1.02),
+                opacity=0.6,
+                line=dict(width=1, color='white')
+            ),
+            customdata=np.column_stack([n, mean_color]),
+            hovertemplate=(
+                "Weight: %{x:.2f} tons<br>"
+                "Rollover Rating: %{y:.2f}<br>"
+                "Vehicles: %{customdata[0]}<br>"
+                "Avg Overall Rating: %{customdata[1]:.2f}<br>"
+                "<extra></extra>"
+            )
+        )
+
+    def view_trace(self, x_range=None, y_range=None):
+        """Individual WebGL markers when few enough vehicles are in view, else the binned view."""
+        x_range = x_range or self.full_x
+        y_range = y_range or self.full_y
+        mask = self.in_view(x_range, y_range)
+        if mask.sum() <= LOD_MAX_POINTS:
+            return vehicle_trace(self.df[mask], webgl=True)
+        return self.binned_trace(mask, x_range, y_range)
+
+def _axis_range(relayout, axis, current):
+    """New [lo, hi] for `axis` from Dash relayoutData; None = full extent."""
+    if not relayout:
+        return current
+    if relayout.get(f'{axis}.autorange'):
+        return None
+    if f'{axis}.range[0]' in relayout:
+        return [relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']]
+    if f'{axis}.range' in relayout:
+        return list(relayout[f'{axis}.range'])
+    return current
+
+def lod_figure(points, summary, n_vehicles, r_value, x_range=None, y_range=None):
+    fig = go.Figure([points.view_trace(x_range, y_range)] + summary)
+    style_figure(fig, n_vehicles, r_value)
+    # keep the user's zoom when the callback swaps in a re-binned figure
+    fig.update_layout(uirevision='lod')
+    return fig
+
+def create_lod_app(df_clean=None):
+    """Dash app for the scalable view; the summary traces are computed once."""
+    from dash import Dash, dcc, html
+    from dash.dependencies import Input, Output, State
+
+    df_clean = prepare_weight_safety_data() if df_clean is None else df_clean
+    points = WeightPoints(df_clean)
+    summary, r_value = summary_traces(df_clean)
+
+    app = Dash(__name__)
+    app.layout = html.Div([
+        dcc.Graph(id='weight-graph', figure=lod_figure(points, summary, len(df_clean), r_value)),
+        dcc.Store(id='weight-view', data={'x': None, 'y': None}),
+    ])
+
+    @app.callback(
+        Output('weight-graph', 'figure'),
+        Output('weight-view', 'data'),
+        Input('weight-graph', 'relayoutData'),
+        State('weight-view', 'data'),
+    )
+    def rebin(relayout, view):
+        view = {'x': _axis_range(relayout, 'xaxis', view['x']), 'y': _axis_range(relayout, 'yaxis', view['y'])}
+        return lod_figure(points, summary, len(df_clean), r_value, view['x'], view['y']), view
+
+    return app
+
+def synthetic_weight_data(n, seed=0):
+    """n made-up vehicles shaped like prepare_weight_safety_data output, for benchmarks."""
+    rng = np.random.default_rng(seed)
+    weight = rng.uniform(0.6, 4.5, n)
+    rollover = np.clip(np.round(5.2 - 0.3 * weight + rng.normal(0, 0.7, n)), 1, 5)
+    return pd.DataFrame({
+        'MAKE': pd.Categorical(rng.choice([f'MAKE{i}' for i in range(60)], n)),
+        'MODEL': pd.Categorical(rng.choice([f'MODEL{i}' for i in range(500)], n)),
+        'MODEL_YR': pd.array(rng.integers(2000, 2026, n), dtype='Int16'),
+        'ROLLOVER_STARS': rollover,
+        'OVERALL_STARS': np.where(rng.random(n) < 0.8, rng.integers(1, 6, n), np.nan),
+        'WEIGHT_TONS': weight,
+    })
+
+def benchmark_lod(n=1_000_000):
+    """Figure build time and JSON payload per view on n synthetic vehicles."""
+    import time
+    df_clean = synthetic_weight_data(n)
+    points = WeightPoints(df_clean)
+    summary, r_value = summary_traces(df_clean)
+    views = [
+        ('full view', None, None),
+        ('zoomed 10x', [2.0, 2.39], [3.5, 4.5]),
+        ('zoomed to single vehicles', [2.0, 2.004], [3.5, 4.5]),
+    ]
+    for label, x_range, y_range in views:
+        start = time.perf_counter()
+        fig = lod_figure(points, summary, n, r_value, x_range, y_range)
+        payload = fig.to_json()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<28}{elapsed * 1000:>8.0f} ms{len(payload) / 1024:>8.0f} KB  "
+              f"{len(fig.data[0].x):>6} markers ({fig.data[0].name})")
+
 if __name__ == "__main__":
-    create_weight_safety_visualization()
\ No newline at end of file
+    import sys
+    if "--benchmark" in sys.argv:
+        benchmark_lod()
+    elif "--dash" in sys.argv:
+        create_lod_app().run(debug=False, port=8057)
+    elif "--stream" in sys.argv:
+        create_streamed_visualization()
+    else:
+        create_weight_safety_visualization()
\ No newline at end of file
@@ -1,22 +1,108 @@
+import json
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
-df = pd.read_csv('data/safety_ratings.csv', low_memory=False)
+from packed_arrays import JS_UNPACK, pack, pack_uint
+from safety_ratings import load_safety_ratings
+
+df = load_safety_ratings()
 
 def prepare_data():
-    df_clean = df.copy()
-    df_clean['MODEL_YR'] = pd.to_numeric(df_clean['MODEL_YR'], errors='coerce')
-    df_clean['ROLLOVER_STARS'] = pd.to_numeric(df_clean['ROLLOVER_STARS'], errors='coerce')
-    df_clean = df_clean.dropna(subset=['MODEL_YR', 'ROLLOVER_STARS', 'MAKE'])
+    df_clean = df.dropna(subset=['MODEL_YR', 'ROLLOVER_STARS', 'MAKE'])
     current_year = pd.Timestamp.now().year
     df_clean = df_clean[(df_clean['MODEL_YR'] >= 2000) & (df_clean['MODEL_YR'] <= current_year)]
     return df_clean
 
-def create_rollover_dashboard():
+def rollover_matrices(df_clean):
+    """Average rollover rating and number of ratings per model year (rows) and make (columns)."""
+    pivot_avg = df_clean.pivot_table(values='ROLLOVER_STARS', index='MODEL_YR', columns='MAKE', aggfunc='mean', observed=True)
+    pivot_count = df_clean.pivot_table(values='ROLLOVER_STARS', index='MODEL_YR', columns='MAKE', aggfunc='count', observed=True)
+    return pivot_avg, pivot_count
+
+def rollover_trace(make, color, pivot_avg, pivot_count):
+    return go.Scatter(
+        x=pivot_avg.index,
+        y=pivot_avg[make],
+        mode='lines+markers',
+        name=make,
+        showlegend=False,
+        line=dict(color=color, width=3),
+        marker=dict(size=8),
+        hovertemplate=(
+            f"<b>{make}</b><br>"
+            "Year: %{x}<br>"
+            "Avg Rating: %{y:.2f}<br>"
+            "Models: %{customdata[0]}<br>"
+            "<extra></extra>"
+        ),
+        customdata=pivot_count[make].fillna(0).astype(int).values.reshape(-1, 1)
+    )
+
+# Runs after the plot is created: the dropdown buttons only carry
+# [trace slot, make index], and this looks the make up in the packed matrices
+COMPACT_SCRIPT = """
+const gd = document.getElementById('{plot_id}');
+const data = __DATA__;
+""" + JS_UNPACK + """
+const count = unpack(data.count, UINT[data.count_bytes]);
+// whole-star ratings ship as sums (the average is sum / count), anything else as averages
+const avg = data.sum
+    ? Float64Array.from(unpack(data.sum, UINT[data.sum_bytes]), (v, j) => v / count[j])
+    : unpack(data.avg, Float64Array);
+const n = data.n_years;
+gd.on('plotly_buttonclicked', function (e) {
+    const [slot, i] = e.button.args;
+    const make = data.makes[i];
+    const y = Array.from(avg.subarray(i * n, (i + 1) * n), v => (isNaN(v) ? null : v));
+    const customdata = Array.from(count.subarray(i * n, (i + 1) * n), c => [c]);
+    Plotly.restyle(gd, {
+        y: [y],
+        customdata: [customdata],
+        name: make,
+        hovertemplate: '<b>' + make + '</b><br>' + data.hover,
+    }, [slot]);
+});
+"""
+
+def write_compact_html(fig, makes, pivot_avg, pivot_count, path):
+    """
+    Write the dashboard as HTML that stores the make x year matrices once
+    (packed, one row per make) instead of a full copy in every dropdown button.
+    """
+    avg = pivot_avg.reindex(columns=makes).to_numpy(dtype=np.float64).T
+    count = pivot_count.reindex(columns=makes).fillna(0).to_numpy(dtype=np.float64).T
+    data = {
+        "makes": makes,
+        "n_years": len(pivot_avg.index),
+        "hover": "Year: %{x}<br>Avg Rating: %{y:.2f}<br>Models: %{customdata[0]}<br><extra></extra>",
+    }
+    data["count"], data["count_bytes"] = pack_uint(count)
+    sums = np.rint(np.nan_to_num(avg) * count)
+    with np.errstate(invalid="ignore"):
+        exact = (sums >= 0).all() and np.array_equal(sums / count, avg, equal_nan=True)
+    if exact:
+        data["sum"], data["sum_bytes"] = pack_uint(sums)
+    else:
+        data["avg"] = pack(avg, "<f8")
+    # menu k drives trace k
+    for slot, menu in enumerate(fig.layout.updatemenus):
+        menu.buttons = [dict(method="skip", label=make, args=[slot, i]) for i, make in enumerate(makes)]
+    script = COMPACT_SCRIPT.replace("__DATA__", json.dumps(data))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fig.write_html(path, include_plotlyjs="cdn", post_script=script)
+
+def create_rollover_dashboard(compact_html=None):
+    """
+    Show the two-make rollover comparison, or with `compact_html` write it
+    to that path as compact data-driven HTML (see write_compact_html).
+    """
     df_clean = prepare_data()
     makes = sorted(df_clean['MAKE'].unique())
-    pivot_avg = df_clean.pivot_table(values='ROLLOVER_STARS', index='MODEL_YR', columns='MAKE', aggfunc='mean')
-    pivot_count = df_clean.pivot_table(values='ROLLOVER_STARS', index='MODEL_YR', columns='MAKE', aggfunc='count')
+    pivot_avg, pivot_count = rollover_matrices(df_clean)
     fig = go.Figure()
     colors = ['#1f77b4', '#ff7f0e']
     default_make1 = 'ACURA'
@@ -24,23 +110,7 @@ def create_rollover_dashboard():
     
     for make, color in [(default_make1, colors[0]), (default_make2, colors[1])]:
         if make in pivot_avg.columns:
-            fig.add_trace(go.Scatter(
-                x=pivot_avg.index,
-                y=pivot_avg[make],
-                mode='lines+markers',
-                name=make,
-                showlegend=False,
-                line=dict(color=color, width=3),
-                marker=dict(size=8),
-                hovertemplate=(
-                    f"<b>{make}</b><br>"
-                    "Year: %{x}<br>"
-                    "Avg Rating: %{y:.2f}<br>"
-                    "Models: %{customdata[0]}<br>"
-                    "<extra></extra>"
-                ),
-                customdata=pivot_count[make].fillna(0).astype(int).values.reshape(-1, 1)
-            ))
+            fig.add_trace(rollover_trace(make, color, pivot_avg, pivot_count))
     
     fig.update_layout(
         xaxis_title="Model Year",
@@ -99,7 +169,18 @@ def create_rollover_dashboard():
         ]
     )
     
-    fig.show()
+    if compact_html is None:
+        fig.show()
+        return
+
+    full_size = len(fig.to_html(include_plotlyjs="cdn"))
+    write_compact_html(fig, makes, pivot_avg, pivot_count, compact_html)
+    print(f"Wrote {compact_html}: {os.path.getsize(compact_html) / 1024:.0f} KB for {len(makes)} makes "
+          f"(with the data copied into every button: {full_size / 1024:.0f} KB)")
 
 if __name__ == "__main__":
-    create_rollover_dashboard()
\ No newline at end of file
+    # python viz5.py --html output/rollover.html  -> compact HTML instead of fig.show()
+    if "--html" in sys.argv:
+        create_rollover_dashboard(compact_html=sys.argv[sys.argv.index("--html") + 1])
+    else:
+        create_rollover_dashboard()
\ No newline at end of file
@@ -1,3 +1,4 @@
+import math
 import pandas as pd
 import numpy as np
 from textwrap import dedent
@@ -5,72 +6,178 @@ import dash
 from dash import dcc, html, Input, Output, State
 import plotly.graph_objects as go
 
+from artifacts import map_artifact
+from preprocess import load_us_sales
+
 """
 Discarded visualization
 """
 
 CSV_PATH = "data/cars23_US.csv"
+US_SALES_ARTIFACT = "us_sales"
 
-def load_and_clean(csv_path=CSV_PATH):
-    df = pd.read_csv(CSV_PATH, dtype=str, encoding="utf-16")
-    df.columns = [c.strip() for c in df.columns]
-    if "Year" in df.columns:
-        df["Year"] = pd.to_numeric(df["Year"], errors="coerce").astype("Int64")
-    if "Price" in df.columns:
-        df["Price"] = df["Price"].str.replace(",", "", regex=False)
-        df["Price"] = pd.to_numeric(df["Price"], errors="coerce")
-    if "Mileage" in df.columns:
-        df["Mileage"] = df["Mileage"].str.replace(",", "", regex=False)
-        df["Mileage"] = pd.to_numeric(df["Mileage"], errors="coerce")
-    text_cols = ["Brand", "Model", "Status", "Dealer"]
-    for c in text_cols:
-        if c in df.columns:
-            df[c] = df[c].astype(str).str.strip().replace({"nan": None})
-    if "Status" in df.columns:
-        df["Status"] = df["Status"].replace({
-            "Certified Pre-Owned": "Certified",
-            "certified pre-owned": "Certified",
-            "Certified Pre-owned": "Certified",
-            "Certified Pre Owned": "Certified",
-        })
-    return df
-
-df = load_and_clean(CSV_PATH)
-df.replace({"": np.nan, "None": np.nan, "nan": np.nan}, inplace=True)
+# prebuilt by build_artifacts.py; mapped read-only so gunicorn workers share it
+df = map_artifact(US_SALES_ARTIFACT, [CSV_PATH])
+if df is None:
+    df = load_us_sales(CSV_PATH)
 year_min = int(df["Year"].min()) if df["Year"].notna().any() else 2000
 year_max = int(df["Year"].max()) if df["Year"].notna().any() else 2025
 available_statuses = list(pd.Categorical(df["Status"].dropna().unique()))
 if not available_statuses:
     available_statuses = ["New", "Used", "Certified"]
 
+SUM_FIELDS = ["price_sum", "price_n", "mileage_sum", "mileage_n", "rows"]
+
 def aggregate_for_display(df, groupby_col, selected_statuses, year_range):
-    d = df.copy()
-    d = d[(d["Year"].notna()) & (d["Year"] >= year_range[0]) & (d["Year"] <= year_range[1])]
+    """
+    Per (group, Status): average price and mileage and the listing count;
+    per group: the count-weighted average price used for ordering, and the
+    average mileage over all filtered listings. Only built-in sums and
+    counts run over the listings; everything else is derived from those
+    small tables.
+    """
+    year = df["Year"]
+    mask = year.notna() & (year >= year_range[0]) & (year <= year_range[1])
     if selected_statuses:
-        d = d[d["Status"].isin(selected_statuses)]
+        mask &= df["Status"].isin(selected_statuses)
+    d = df.loc[mask, [groupby_col, "Status", "Price", "Mileage"]]
+
     group_cols = [groupby_col, "Status"]
-    agg = d.groupby(group_cols).agg(
-        avg_price = pd.NamedAgg(column="Price", aggfunc=lambda s: np.nan if s.dropna().empty else s.dropna().mean()),
-        avg_mileage = pd.NamedAgg(column="Mileage", aggfunc=lambda s: np.nan if s.dropna().empty else s.dropna().mean()),
-        count = pd.NamedAgg(column="Price", aggfunc=lambda s: s.notna().sum() if s.notna().any() else len(s))
-    ).reset_index()
-    group_overall = agg.groupby(groupby_col).apply(
-        lambda g: pd.Series({
-            "group_avg_price": np.nan if g["avg_price"].dropna().empty else np.average(g["avg_price"].dropna(), weights=g.loc[g["avg_price"].notna(), "count"])
-        })
-    ).reset_index()
-    agg = agg.merge(group_overall, on=groupby_col, how="left")
+    sums = d.groupby(group_cols, observed=True).agg(
+        price_sum=("Price", "sum"),
+        price_n=("Price", "count"),
+        mileage_sum=("Mileage", "sum"),
+        mileage_n=("Mileage", "count"),
+        rows=("Status", "size"),
+    )
+    mileage = d.groupby(groupby_col, observed=True)["Mileage"].agg(["sum", "count"])
+    return _display_tables(sums, mileage, groupby_col)
+
+def _display_tables(sums, mileage, groupby_col):
+    """
+    aggregate_for_display's two tables from `sums` (SUM_FIELDS per observed
+    (group, Status)) and `mileage` (Mileage sum and count per observed group).
+    """
+    agg = sums.index.to_frame(index=False)
+    price_n = sums["price_n"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        agg["avg_price"] = np.where(price_n > 0, sums["price_sum"].to_numpy() / price_n, np.nan)
+        agg["avg_mileage"] = np.where(sums["mileage_n"].to_numpy() > 0,
+                                      sums["mileage_sum"].to_numpy() / sums["mileage_n"].to_numpy(), np.nan)
+    # listings with a price, or all listings when none has one
+    agg["count"] = np.where(price_n > 0, price_n, sums["rows"].to_numpy()).astype("int64")
+
+    # count-weighted average of avg_price per group; the status columns are
+    # added one at a time so the result rounds exactly like np.average did
+    weighted = pd.Series(np.where(price_n > 0, agg["avg_price"].to_numpy() * price_n, 0.0), index=sums.index)
+    weighted = weighted.unstack("Status", fill_value=0.0)
+    numerator = pd.Series(0.0, index=weighted.index)
+    for status in weighted.columns:
+        numerator = numerator + weighted[status]
+    denominator = sums["price_n"].unstack("Status", fill_value=0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        group_avg_price = (numerator / denominator).where(denominator > 0)
+    agg["group_avg_price"] = group_avg_price.reindex(agg[groupby_col]).to_numpy()
+
     agg.sort_values(["group_avg_price", groupby_col], ascending=[False, True], inplace=True)
-    agg["group_order"] = pd.Categorical(agg[groupby_col], categories=agg[groupby_col].unique(), ordered=True)
-    mileage = d.copy()
-    mileage_group = mileage.groupby(groupby_col).agg(
-        avg_mileage = pd.NamedAgg(column="Mileage", aggfunc=lambda s: np.nan if s.dropna().empty else s.dropna().mean()),
-        count_with_mileage = pd.NamedAgg(column="Mileage", aggfunc=lambda s: s.notna().sum())
-    ).reset_index()
-    mileage_group[groupby_col] = pd.Categorical(mileage_group[groupby_col], categories=agg[groupby_col].unique(), ordered=True)
+    # group keys are categorical: order by the values as they appear, not by their categories
+    order = np.asarray(agg[groupby_col].unique())
+    agg["group_order"] = pd.Categorical(agg[groupby_col], categories=order, ordered=True)
+
+    mileage_group = mileage.index.to_frame(index=False)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mileage_group["avg_mileage"] = np.where(mileage["count"].to_numpy() > 0,
+                                                mileage["sum"].to_numpy() / mileage["count"].to_numpy(), np.nan)
+    mileage_group["count_with_mileage"] = mileage["count"].to_numpy().astype("int64")
+    mileage_group[groupby_col] = pd.Categorical(mileage_group[groupby_col], categories=order, ordered=True)
     mileage_group.sort_values(groupby_col, inplace=True)
     return agg, mileage_group
 
+class ListingCube:
+    """
+    SUM_FIELDS per (group, Status, Year) for one grouping column, summed
+    cumulatively along Year. The totals for any year range are then the
+    difference of two Year slices, so a filter change costs
+    O(groups x statuses) however many listings there are. The Year axis has
+    one slot per distinct year, so a stray year like 0 or 9999 adds one
+    slot, not thousands.
+    """
+
+    def __init__(self, df, groupby_col):
+        self.groupby_col = groupby_col
+        groups = df[groupby_col].astype("category")
+        status = df["Status"].astype("category")
+        self.groups = groups.cat.categories
+        self.statuses = status.cat.categories
+        valid = df["Year"].notna().to_numpy()
+        self.years, year_idx = np.unique(df["Year"][valid].to_numpy(dtype=np.int64), return_inverse=True)
+        # the last group and status slots hold listings without one (code -1);
+        # Year slot 0 stays empty so every prefix sum has a zero to start from
+        shape = (len(self.groups) + 1, len(self.statuses) + 1, len(self.years) + 1)
+        cell = np.ravel_multi_index((
+            groups.cat.codes.to_numpy()[valid] % shape[0],
+            status.cat.codes.to_numpy()[valid] % shape[1],
+            year_idx + 1,
+        ), shape)
+        price = df["Price"].to_numpy(dtype=np.float64)[valid]
+        mileage = df["Mileage"].to_numpy(dtype=np.float64)[valid]
+        has_price, has_mileage = ~np.isnan(price), ~np.isnan(mileage)
+
+        def prefix(cells, weights=None):
+            totals = np.bincount(cells, weights, minlength=np.prod(shape))
+            return totals.reshape(shape).cumsum(axis=2)
+
+        self.sums = {
+            "price_sum": prefix(cell[has_price], price[has_price]),
+            "price_n": prefix(cell[has_price]),
+            "mileage_sum": prefix(cell[has_mileage], mileage[has_mileage]),
+            "mileage_n": prefix(cell[has_mileage]),
+            "rows": prefix(cell),
+        }
+
+    def _window(self, year_range):
+        """SUM_FIELDS per (group, status) slot for the listings in year_range."""
+        # prefix slot k holds the listings of the k smallest years
+        lo = int(np.searchsorted(self.years, math.ceil(year_range[0]), side="left"))
+        hi = max(int(np.searchsorted(self.years, math.floor(year_range[1]), side="right")), lo)
+        return {field: prefix[:, :, hi] - prefix[:, :, lo] for field, prefix in self.sums.items()}
+
+    def _selected(self, selected_statuses):
+        if not selected_statuses:
+            return np.ones(len(self.statuses), dtype=bool)
+        return self.statuses.isin(selected_statuses)
+
+    def aggregate(self, selected_statuses, year_range):
+        """Same result as aggregate_for_display(df, groupby_col, selected_statuses, year_range)."""
+        window = self._window(year_range)
+        statuses = self._selected(selected_statuses)
+        rows = window["rows"][:-1, :-1]
+        group_idx, status_idx = np.nonzero((rows > 0) & statuses)
+        index = pd.MultiIndex.from_arrays([
+            pd.Categorical.from_codes(group_idx, categories=self.groups),
+            pd.Categorical.from_codes(status_idx, categories=self.statuses),
+        ], names=[self.groupby_col, "Status"])
+        sums = pd.DataFrame({field: window[field][:-1, :-1][group_idx, status_idx] for field in SUM_FIELDS},
+                            index=index)
+
+        # the per-group mileage also counts listings without a status when no status filter is set
+        slots = np.append(statuses, not selected_statuses)
+        present = np.nonzero(window["rows"][:-1, slots].sum(axis=1) > 0)[0]
+        mileage = pd.DataFrame({
+            "sum": window["mileage_sum"][:-1, slots].sum(axis=1)[present],
+            "count": window["mileage_n"][:-1, slots].sum(axis=1)[present],
+        }, index=pd.CategoricalIndex(pd.Categorical.from_codes(present, categories=self.groups),
+                                     name=self.groupby_col))
+        return _display_tables(sums, mileage, self.groupby_col)
+
+    def total_listings(self, selected_statuses, year_range):
+        """Listings in year_range whose Status is one of selected_statuses (any group)."""
+        rows = self._window(year_range)["rows"][:, :-1]
+        return int(rows[:, self.statuses.isin(selected_statuses or [])].sum())
+
+# built once at startup; the callback only slices these
+CUBES = {col: ListingCube(df, col) for col in ["Brand", "Model"]}
+
 app = dash.Dash(__name__)
 server = app.server
 
@@ -126,7 +233,7 @@ app.layout = html.Div([
     Input("year_slider", "value"),
 )
 def update_figure(grouping, selected_statuses, year_slider):
-    agg_df, mileage_df = aggregate_for_display(df, grouping, selected_statuses, year_slider)
+    agg_df, mileage_df = CUBES[grouping].aggregate(selected_statuses, year_slider)
     if agg_df.empty:
         fig = go.Figure()
         fig.update_layout(
@@ -190,12 +297,86 @@ def update_figure(grouping, selected_statuses, year_slider):
     )
     if len(groups_order) > 30:
         fig.update_layout(xaxis_tickangle=45)
-    total_listings = df[
-        (df["Year"].notna()) & (df["Year"] >= year_slider[0]) & (df["Year"] <= year_slider[1]) & 
-        (df["Status"].isin(selected_statuses))
-    ].shape[0]
+    total_listings = CUBES[grouping].total_listings(selected_statuses, year_slider)
     summary = f"Showing {total_listings} listings across {len(groups_order)} {grouping.lower() + ('s' if not grouping.endswith('s') else '')}."
     return fig, summary
 
+def _aggregate_with_lambdas(df, groupby_col, selected_statuses, year_range):
+    """The previous implementation of aggregate_for_display, kept for benchmark_aggregate."""
+    d = df.copy()
+    d = d[(d["Year"].notna()) & (d["Year"] >= year_range[0]) & (d["Year"] <= year_range[1])]
+    if selected_statuses:
+        d = d[d["Status"].isin(selected_statuses)]
+    group_cols = [groupby_col, "Status"]
+    agg = d.groupby(group_cols, observed=True).agg(
+        avg_price = pd.NamedAgg(column="Price", aggfunc=lambda s: np.nan if s.dropna().empty else s.dropna().mean()),
+        avg_mileage = pd.NamedAgg(column="Mileage", aggfunc=lambda s: np.nan if s.dropna().empty else s.dropna().mean()),
+        count = pd.NamedAgg(column="Price", aggfunc=lambda s: s.notna().sum() if s.notna().any() else len(s))
+    ).reset_index()
+    group_overall = agg.groupby(groupby_col, observed=True).apply(
+        lambda g: pd.Series({
+            "group_avg_price": np.nan if g["avg_price"].dropna().empty else np.average(g["avg_price"].dropna(), weights=g.loc[g["avg_price"].notna(), "count"])
+        })
+    ).reset_index()
+    agg = agg.merge(group_overall, on=groupby_col, how="left")
+    agg.sort_values(["group_avg_price", groupby_col], ascending=[False, True], inplace=True)
+    order = np.asarray(agg[groupby_col].unique())
+    agg["group_order"] = pd.Categorical(agg[groupby_col], categories=order, ordered=True)
+    mileage = d.copy()
+    mileage_group = mileage.groupby(groupby_col, observed=True).agg(
+        avg_mileage = pd.NamedAgg(column="Mileage", aggfunc=lambda s: np.nan if s.dropna().empty else s.dropna().mean()),
+        count_with_mileage = pd.NamedAgg(column="Mileage", aggfunc=lambda s: s.notna().sum())
+    ).reset_index()
+    mileage_group[groupby_col] = pd.Categorical(mileage_group[groupby_col], categories=order, ordered=True)
+    mileage_group.sort_values(groupby_col, inplace=True)
+    return agg, mileage_group
+
+def synthetic_listings(n, seed=0):
+    """n made-up listings shaped like load_us_sales output, for benchmarks."""
+    rng = np.random.default_rng(seed)
+    brands = [f"Brand {i}" for i in range(40)]
+    models = [f"Model {i}" for i in range(1500)]
+    listings = pd.DataFrame({
+        "Year": pd.array(rng.integers(1995, 2025, n), dtype="Int16"),
+        "Brand": pd.Categorical.from_codes(rng.integers(0, len(brands), n), categories=brands),
+        "Model": pd.Categorical.from_codes(rng.integers(0, len(models), n), categories=models),
+        "Status": pd.Categorical.from_codes(rng.integers(0, 3, n), categories=["Certified", "New", "Used"]),
+        "Price": rng.integers(3_000, 120_000, n).astype("float64"),
+        "Mileage": rng.integers(0, 250_000, n).astype("float64"),
+    })
+    listings.loc[rng.random(n) < 0.02, "Price"] = np.nan
+    listings.loc[rng.random(n) < 0.05, "Mileage"] = np.nan
+    return listings
+
+def benchmark_aggregate(n=1_000_000):
+    """
+    One filter change on n synthetic listings: the previous lambda/apply
+    version, aggregate_for_display and a ListingCube query.
+    """
+    import time
+    listings = synthetic_listings(n)
+    statuses = ["Certified", "New", "Used"]
+    for grouping in ["Brand", "Model"]:
+        start = time.perf_counter()
+        cube = ListingCube(listings, grouping)
+        build = time.perf_counter() - start
+        timings = []
+        for aggregate in [_aggregate_with_lambdas, aggregate_for_display]:
+            start = time.perf_counter()
+            result = aggregate(listings, grouping, statuses, [2000, 2020])
+            timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        from_cube = cube.aggregate(statuses, [2000, 2020])
+        timings.append(time.perf_counter() - start)
+        expected = _aggregate_with_lambdas(listings, grouping, statuses, [2000, 2020])
+        identical = all(a.equals(b) and a.equals(c) for a, b, c in zip(expected, result, from_cube))
+        print(f"{grouping:<6} lambdas {timings[0]:6.2f}s  vectorized {timings[1]:6.3f}s  "
+              f"({timings[0] / timings[1]:.0f}x)  cube {timings[2] * 1000:5.1f}ms "
+              f"(built in {build:.2f}s)  identical: {identical}")
+
 if __name__ == "__main__":
-    app.run(debug=True, port=8056)
\ No newline at end of file
+    import sys
+    if "--benchmark" in sys.argv:
+        benchmark_aggregate()
+    else:
+        app.run(debug=True, port=8056)
\ No newline at end of file